@@ -4,8 +4,8 @@ TEMPLATE: Copy this file to create a new scraper
 Instructions:
 1. Copy this file to a new name (e.g., scraper_incidents.py)
 2. Update the docstring at the top with the scraper name
-3. Update the URL in export_data() function
-4. Customize the export_data() function to interact with your specific page
+3. Update REPORT_URL
+4. Customize the run_export() function to interact with your specific page
 5. Update main() to use the correct environment variables for SHEET_ID
 6. Add your scraper to the GitHub Actions workflow if needed
 
@@ -18,79 +18,101 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 import os
-import time
+import shutil
+import tempfile
+import multiprocessing
+from multiprocessing.util import Finalize
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
 from utils import (
-    setup_driver,
-    login_to_reliatrax,
+    get_or_create_driver,
+    get_or_create_session,
+    quit_all_drivers,
     write_to_sheets,
+    append_rows_to_sheets,
     wait_for_csv_download,
     read_csv_file,
     clear_old_csv_files
 )
 
 
-def export_data(driver, start_date, end_date):
+REPORT_URL = "https://wefortify.reliatrax.net/Report.aspx/ClientDailyActivity"
+
+# Fills the date fields, fires their change handlers and clicks GO (UPDATE THE IDS)
+SUBMIT_DATE_RANGE_JS = """
+var previousExport = document.getElementById('downloadCSVLinkID');
+var fields = [['dayDateStart', arguments[0]], ['dayDateEnd', arguments[1]]];
+fields.forEach(function (field) {
+    var input = document.getElementById(field[0]);
+    input.value = field[1];
+    input.dispatchEvent(new Event('change', {bubbles: true}));
+});
+document.querySelector("input[type='submit'][value='GO']").click();
+return previousExport;
+"""
+
+# Number of browser processes used to export monthly chunks in parallel.
+# Override with the WEFORTIFY_WORKERS env var; 1 runs everything in a single browser.
+DEFAULT_WORKERS = 4
+
+# Process-local state: each worker process owns one logged-in browser and download directory,
+# created on first use from the credentials its initializer stored
+_worker_credentials = None
+_worker_driver = None
+_worker_download_dir = None
+_worker_on_report = False
+
+
+def navigate_to_report(driver):
+    """
+    Load the export page
+
+    Only needed once per browser: the date form stays on the page after each GO
+    postback, so later exports re-use it via run_export().
     """
-    Navigate to export page and trigger CSV download
+    print("Navigating to export page...")
+    driver.get(REPORT_URL)
+
+
+def run_export(driver, start_date, end_date, download_dir="/tmp"):
+    """
+    Fill the date range on the already-loaded export page and trigger CSV download
 
     CUSTOMIZE THIS FUNCTION for your specific export page:
-    - Update the URL to your export page
     - Update element IDs/selectors to match your page
     - Add/remove form interactions as needed
     """
-    print("Navigating to export page...")
-    driver.get("https://wefortify.reliatrax.net/Report.aspx/ClientDailyActivity")
-
     try:
         wait = WebDriverWait(driver, 20)
 
-        print("Waiting for export page to load...")
-        time.sleep(2)
-
         # EXAMPLE: Select dropdown - customize as needed
         # print("Looking for dropdown...")
         # dropdown = wait.until(EC.presence_of_element_located((By.ID, "yourDropdownId")))
         # select = Select(dropdown)
         # select.select_by_value("1")
-        # time.sleep(1)
-
-        # Set start date (if your page has date fields)
-        print(f"Setting start date to {start_date}...")
-        start_date_field = wait.until(EC.presence_of_element_located((By.ID, "dayDateStart")))
-        start_date_field.clear()
-        start_date_field.send_keys(start_date)
-        print("Start date set successfully")
-        time.sleep(0.5)
-
-        # Set end date (if your page has date fields)
-        print(f"Setting end date to {end_date}...")
-        end_date_field = driver.find_element(By.ID, "dayDateEnd")
-        end_date_field.clear()
-        end_date_field.send_keys(end_date)
-        print("End date set successfully")
-        time.sleep(0.5)
-
-        # Click the GO button to submit the date range
-        print("Looking for GO button...")
-        go_button = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "input[type='submit'][value='GO']")))
-        print("Found GO button, clicking...")
-        go_button.click()
-        time.sleep(2)  # Wait for results to load
+
+        # Set the date range and submit it in one round trip. Returns the export link left
+        # over from the previous month's results, if any, so we can wait for it to go stale.
+        print(f"Setting date range to {start_date} - {end_date} and clicking GO...")
+        wait.until(EC.presence_of_element_located((By.ID, "dayDateStart")))
+        previous_export = driver.execute_script(SUBMIT_DATE_RANGE_JS, start_date, end_date)
+
+        # Don't click the previous results' link before the new ones replace it
+        if previous_export is not None:
+            wait.until(EC.staleness_of(previous_export))
 
         # Clear old CSV files before download
-        clear_old_csv_files()
+        clear_old_csv_files(download_dir)
 
-        # Find and click the export button - UPDATE THE ID
+        # Wait for the results to load by waiting on the export button itself - UPDATE THE ID
         print("Looking for export button...")
-        export_button = wait.until(EC.presence_of_element_located((By.ID, "downloadCSVLinkID")))
+        export_button = wait.until(EC.element_to_be_clickable((By.ID, "downloadCSVLinkID")))
         print("Found export button, clicking...")
         export_button.click()
 
         # Wait for file to download
-        downloaded_file = wait_for_csv_download()
+        downloaded_file = wait_for_csv_download(download_dir)
 
         # Read the CSV file
         csv_data = read_csv_file(downloaded_file)
@@ -105,6 +127,14 @@ def export_data(driver, start_date, end_date):
         raise
 
 
+def export_data(driver, start_date, end_date, download_dir="/tmp"):
+    """
+    Navigate to export page and trigger CSV download for a single date range
+    """
+    navigate_to_report(driver)
+    return run_export(driver, start_date, end_date, download_dir)
+
+
 def generate_monthly_ranges(start_date, end_date):
     """Generate monthly date ranges between start_date and end_date
 
@@ -129,24 +159,130 @@ def generate_monthly_ranges(start_date, end_date):
     return ranges
 
 
+def _init_worker(username, password):
+    """Remember the credentials for this process's browser; it starts on first use
+
+    Nothing here can fail: an exception in a Pool initializer just makes the pool
+    restart the worker (and log in again) forever, so the login happens in
+    _get_worker_driver, where a failure reaches the caller.
+    """
+    global _worker_credentials, _worker_driver, _worker_on_report
+
+    _worker_credentials = (username, password)
+    _worker_driver = None
+    _worker_on_report = False
+
+    # atexit hooks don't run in pool workers, multiprocessing finalizers do (on close/join)
+    Finalize(None, _cleanup_worker, exitpriority=10)
+
+
+def _get_worker_driver():
+    """Return this process's logged-in browser, starting it on first use"""
+    global _worker_driver, _worker_download_dir
+
+    if _worker_driver is None:
+        # Separate download directory per worker so parallel exports never pick up each other's CSVs
+        if _worker_download_dir is None:
+            _worker_download_dir = tempfile.mkdtemp(prefix="client_summary_")
+        username, password = _worker_credentials
+        _worker_driver = get_or_create_driver(username, password, download_dir=_worker_download_dir)
+
+    return _worker_driver
+
+
+def _cleanup_worker():
+    """Close this process's browsers and remove its download directory"""
+    global _worker_driver, _worker_download_dir, _worker_on_report
+
+    _worker_driver = None
+    _worker_on_report = False
+    quit_all_drivers()
+
+    if _worker_download_dir:
+        shutil.rmtree(_worker_download_dir, ignore_errors=True)
+        _worker_download_dir = None
+
+
+def process_month(job):
+    """Export a single monthly chunk with this process's browser
+
+    Args:
+        job: Tuple of (index, total, month_start, month_end)
+
+    Returns:
+        Tuple of (index, data), where data is None if the export failed
+    """
+    global _worker_on_report
+
+    i, total, month_start, month_end = job
+    start_str = month_start.strftime("%m/%d/%Y")
+    end_str = month_end.strftime("%m/%d/%Y")
+
+    print(f"\n[{i}/{total}] Exporting {start_str} to {end_str}...")
+
+    # Outside the try below: a failed login stops the whole export rather than each month
+    driver = _get_worker_driver()
+
+    try:
+        # Load the report page once per worker, then just re-submit the form for each month
+        if not _worker_on_report:
+            navigate_to_report(driver)
+            _worker_on_report = True
+        data = run_export(driver, start_str, end_str, _worker_download_dir)
+    except Exception as e:
+        print(f"  ✗ Error exporting {start_str} to {end_str}: {e}")
+        # Page state is unknown after a failure, so reload it for the next month
+        _worker_on_report = False
+        # Continue with next month instead of failing completely
+        return i, None
+
+    if data["rows"]:
+        print(f"  ✓ Retrieved {len(data['rows'])} rows for {start_str} to {end_str}")
+    else:
+        print(f"  - No data for {start_str} to {end_str}")
+
+    return i, data
+
+
+def stream_to_sheets(results, sheet_id, worksheet_name):
+    """Write monthly results to the sheet as they arrive instead of buffering every month
+
+    The first month with data clears the sheet and writes headers; later months are appended.
+
+    Args:
+        results: Iterable of (index, data) tuples in chronological order
+
+    Returns:
+        Total number of rows written
+    """
+    sheet = None
+    total_rows = 0
+
+    for _, data in results:
+        if not data or not data["rows"]:
+            continue
+
+        if sheet is None:
+            print("Writing first month (with headers) to Google Sheets...")
+            sheet, timestamp = write_to_sheets(data, sheet_id, worksheet_name=worksheet_name, clear_first=True)
+        else:
+            append_rows_to_sheets(data["rows"], sheet, timestamp)
+
+        total_rows += len(data["rows"])
+
+    return total_rows
+
+
 def main():
     # Configure your Google Sheet ID and worksheet tab name
     SHEET_ID = "196rg3YfpssRLsdFig4yN9G3U9NrQFPEeROnr1oSNGCA"
     WORKSHEET_NAME = "client_summary_export"
 
-    driver = None
-
     try:
         # Get credentials from environment
         username = os.environ['RELIATRAX_USERNAME']
         password = os.environ['RELIATRAX_PASSWORD']
 
-        # Setup driver
-        driver = setup_driver()
-
-        # Login (reuses shared login function)
-        login_to_reliatrax(driver, username, password)
-
         # Set overall date range - loop through monthly from 2022-01-01 to today
         overall_start = datetime(2022, 1, 1)
         overall_end = datetime.now()
@@ -158,46 +294,36 @@ def main():
         monthly_ranges = generate_monthly_ranges(overall_start, overall_end)
         print(f"Total months to process: {len(monthly_ranges)}")
 
-        # Collect all data across all months
-        all_headers = None
-        all_rows = []
-
-        for i, (month_start, month_end) in enumerate(monthly_ranges, 1):
-            start_str = month_start.strftime("%m/%d/%Y")
-            end_str = month_end.strftime("%m/%d/%Y")
-
-            print(f"\n[{i}/{len(monthly_ranges)}] Exporting {start_str} to {end_str}...")
-
-            try:
-                data = export_data(driver, start_str, end_str)
-
-                if data["rows"]:
-                    # Store headers from first successful export
-                    if all_headers is None:
-                        all_headers = data["headers"]
-
-                    # Add rows to combined data
-                    all_rows.extend(data["rows"])
-                    print(f"  ✓ Retrieved {len(data['rows'])} rows")
-                else:
-                    print(f"  - No data for this period")
-
-            except Exception as e:
-                print(f"  ✗ Error exporting {start_str} to {end_str}: {e}")
-                # Continue with next month instead of failing completely
-                continue
-
-        # Write all combined data to Google Sheets
-        if all_rows and all_headers:
-            combined_data = {
-                "headers": all_headers,
-                "rows": all_rows
-            }
+        jobs = [(i, len(monthly_ranges), month_start, month_end)
+                for i, (month_start, month_end) in enumerate(monthly_ranges, 1)]
+
+        workers = min(int(os.environ.get("WEFORTIFY_WORKERS", DEFAULT_WORKERS)), len(jobs))
+
+        # Check the credentials once, up front: a rejected login fails here instead of in
+        # every worker. The saved session cookies also let the workers' browsers skip the form.
+        try:
+            get_or_create_session(username, password)
+        except Exception as e:
+            raise Exception(f"ReliaTrax login failed, not starting the export: {e}") from e
+
+        if workers > 1:
+            # Each worker logs in once and exports its share of the months in its own browser
+            print(f"Exporting with {workers} parallel browser workers...")
+            with multiprocessing.Pool(processes=workers, initializer=_init_worker,
+                                      initargs=(username, password)) as pool:
+                # Ordered imap so months are streamed to the sheet chronologically as they finish
+                total_rows = stream_to_sheets(pool.imap(process_month, jobs), SHEET_ID, WORKSHEET_NAME)
+                # Close and join (rather than terminate) so worker finalizers quit their browsers
+                pool.close()
+                pool.join()
+        else:
+            # The pooled browser is left open for anything else run in this process
+            _init_worker(username, password)
+            total_rows = stream_to_sheets(map(process_month, jobs), SHEET_ID, WORKSHEET_NAME)
 
+        if total_rows:
             print(f"\n{'='*60}")
-            print(f"Total rows collected: {len(all_rows)}")
-            print("Writing combined data to Google Sheets...")
-            write_to_sheets(combined_data, SHEET_ID, worksheet_name=WORKSHEET_NAME, clear_first=True)
+            print(f"Total rows written: {total_rows}")
             print("Export completed successfully!")
         else:
             print("No data to export.")
@@ -206,11 +332,6 @@ def main():
         print(f"Error in main execution: {e}")
         raise
 
-    finally:
-        if driver:
-            driver.quit()
-            print("Browser closed.")
-
 
 if __name__ == '__main__':
     main()
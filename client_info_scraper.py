@@ -3,22 +3,73 @@
 This scraper extracts unique ClientIDs from the treatment_thread data
 (already loaded by data_cleaner) and scrapes contact info from each client's page.
 """
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import gspread
+import html
+import json
+import logging
 import os
-import time
 import re
+import time
+import multiprocessing
+from operator import itemgetter
+from datetime import datetime, timedelta
 
 from utils import (
-    setup_driver,
-    login_to_reliatrax,
+    get_or_create_session,
     get_sheets_client,
+    is_login_page,
 )
 
 
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+
 # Configuration
 SHEET_ID = "196rg3YfpssRLsdFig4yN9G3U9NrQFPEeROnr1oSNGCA"
+TREATMENT_THREAD_WORKSHEET = "treatment_thread_export"
+
+# Number of worker processes scraping client pages in parallel.
+# Override with the WEFORTIFY_WORKERS env var; 1 scrapes serially in this process.
+DEFAULT_WORKERS = 4
+
+# Header name span: "Last, First (DOB) "Nickname"" or "Last, First (DOB)"; group names are result keys.
+# The lookaheads keep the old requirement of at least one character before "(" and inside "()".
+NAME_RE = re.compile(
+    r'(?=[^(])\s*(?P<LastName>[^(,]*?)\s*(?:,\s*(?P<FirstName>[^(]*?))?\s*'
+    r'\((?=[^)])\s*(?P<DOB>[^)]*?)\s*\)\s*(?:"(?P<Nickname>[^"]+)")?'
+)
+
+# Client page HTML fields (see scrape_client_info for sample markup)
+NAME_SPAN_RE = re.compile(
+    r'id=["\']ClientHeaderBox["\'].*?<span[^>]*class=["\'][^"\']*\bbold\b[^"\']*["\'][^>]*>([^<]*)</span>',
+    re.S
+)
+# Phone, email and office in one alternation, so the page is scanned once; the named
+# group that matched says which field it is. A mailto-linked email (EmailLink) is
+# preferred over a plain-text one anywhere on the page.
+CONTACT_RE = re.compile(
+    r'Phone Number:\s*<strong>(?P<PhoneNumber>[^<]+)</strong>'
+    r'|Email:\s*<strong>(?:<a[^>]*>(?P<EmailLink>[^<]+)</a>|(?P<Email>[^<]+))</strong>'
+    r'|<span>Assigned Office:</span>\s*<strong>(?P<AssignedOffice>[^<]+)</strong>'
+)
+
+# Seconds before a client page request times out (and is retried)
+PAGE_LOAD_TIMEOUT = 8
+
+# Previously scraped clients, keyed by ClientID, so reruns only visit new or stale clients.
+# Override the path with the CLIENT_INFO_CACHE env var.
+CACHE_FILE = "client_info_cache.jsonl"
+CACHE_MAX_AGE_DAYS = 30
+
+# Minimum seconds between client page requests from one worker (~2 req/s each)
+MIN_REQUEST_INTERVAL = 0.5
+
+# Process-local state for pool workers: the credentials stored by the initializer, the
+# logged-in HTTP session created from them on first use, and when it last sent a request
+_worker_credentials = None
+_worker_session = None
+_worker_last_request = float('-inf')
 
 
 def get_unique_client_ids_from_treatment_thread(treatment_thread):
@@ -27,39 +78,57 @@ def get_unique_client_ids_from_treatment_thread(treatment_thread):
     Args:
         treatment_thread: List of lists with headers in first row, containing ClientID column
     """
-    print("Extracting unique ClientIDs from treatment_thread data...")
+    logger.info("Extracting unique ClientIDs from treatment_thread data...")
 
     if len(treatment_thread) < 2:
-        print("No data found in treatment_thread")
+        logger.info("No data found in treatment_thread")
         return []
 
     headers = treatment_thread[0]
     client_id_col = headers.index('ClientID')
 
-    client_ids = set()
-    for row in treatment_thread[1:]:
-        client_id = row[client_id_col]
-        if client_id:
-            client_ids.add(client_id)
-
-    unique_ids = sorted(list(client_ids))
-    print(f"Found {len(unique_ids)} unique ClientIDs")
+    # First-seen order: deterministic for the same sheet without paying for a sort
+    unique_ids = list(dict.fromkeys(row[client_id_col] for row in treatment_thread[1:] if row[client_id_col]))
+    logger.info("Found %d unique ClientIDs", len(unique_ids))
     return unique_ids
 
 
-def scrape_client_info(driver, client_id):
+def _parse_client_name(name_text):
+    """Split the header name text into FirstName/LastName/DOB/Nickname
+
+    e.g. 'Mijares, Aliyah (5/1/2007) "Zinx"'. Text without a (DOB) part is split
+    on its first comma only.
+    """
+    name_match = NAME_RE.match(name_text)
+    if name_match:
+        return name_match.groupdict(default='')
+
+    # Fallback: try to parse just the name
+    last_name, _, first_name = name_text.partition(',')
+    return {'LastName': last_name.strip(), 'FirstName': first_name.strip()}
+
+
+def scrape_client_info(session, client_id):
     """Scrape client information page for a given ClientID
 
+    The page is server-rendered, so the fields are read straight from its HTML
+    with a logged-in requests.Session; no browser is involved.
+
     URL pattern: https://wefortify.reliatrax.net/TreatmentMaster.aspx/TreatmentMaster/{clientID}
     """
     url = f"https://wefortify.reliatrax.net/TreatmentMaster.aspx/TreatmentMaster/{client_id}"
 
-    print(f"  Navigating to client page: {client_id}")
-    driver.get(url)
+    logger.debug("Fetching client page: %s", client_id)
 
     try:
-        wait = WebDriverWait(driver, 10)
-        time.sleep(2)  # Allow page to fully render
+        # Timeouts and gateway errors are retried by the session's adapter (see get_or_create_session)
+        response = session.get(url, timeout=PAGE_LOAD_TIMEOUT)
+        response.raise_for_status()
+
+        if is_login_page(response.url):
+            raise Exception("Session expired (redirected to login page)")
+
+        page_html = response.text
 
         # Initialize result with ClientID
         result = {
@@ -73,93 +142,36 @@ def scrape_client_info(driver, client_id):
             'AssignedOffice': ''
         }
 
-        # Wait for the Client fieldset to load
-        wait.until(EC.presence_of_element_located((By.ID, "ClientHeaderBox")))
-
         # Extract name from the bold span inside ClientHeaderBox
         # HTML: <span class="bold">Mijares, Aliyah (5/1/2007) "Zinx"</span>
-        try:
-            name_span = driver.find_element(By.CSS_SELECTOR, "#ClientHeaderBox span.bold")
-            name_text = name_span.text
-
-            # Parse: "Mijares, Aliyah (5/1/2007) "Zinx""
-            # Pattern: Name (DOB) "Nickname" or Name (DOB)
-            name_match = re.match(r'^([^(]+)\s*\(([^)]+)\)\s*(?:"([^"]+)")?', name_text)
-            if name_match:
-                full_name = name_match.group(1).strip()
-                result['DOB'] = name_match.group(2).strip()
-                result['Nickname'] = name_match.group(3) or ''
-
-                # Split "LastName, FirstName" into separate fields
-                if ',' in full_name:
-                    parts = full_name.split(',', 1)
-                    result['LastName'] = parts[0].strip()
-                    result['FirstName'] = parts[1].strip()
-                else:
-                    result['LastName'] = full_name
-            else:
-                # Fallback: try to parse just the name
-                if ',' in name_text:
-                    parts = name_text.split(',', 1)
-                    result['LastName'] = parts[0].strip()
-                    result['FirstName'] = parts[1].strip()
-                else:
-                    result['LastName'] = name_text.strip()
-        except Exception as e:
-            print(f"    Warning: Could not find name element: {e}")
-
-        # Extract phone number
+        # A page without it isn't a client page we can read, so fail rather than cache blanks
+        name_span = NAME_SPAN_RE.search(page_html)
+        if name_span is None:
+            raise Exception("Could not find name element")
+        result.update(_parse_client_name(html.unescape(name_span.group(1))))
+
+        # Extract phone, email and assigned office; the first occurrence of each wins,
+        # except that the first linked email beats a plain one that appears earlier
         # HTML: Phone Number: <strong>719-214-5339</strong>
-        try:
-            page_source = driver.page_source
-
-            # Look for phone number pattern in page source
-            phone_match = re.search(
-                r'Phone Number:\s*<strong>([^<]+)</strong>',
-                page_source
-            )
-            if phone_match:
-                result['PhoneNumber'] = phone_match.group(1).strip()
-        except Exception as e:
-            print(f"    Warning: Could not find phone number: {e}")
-
-        # Extract email
         # HTML: Email: <strong><a ... href="mailto:zinxmijares@gmail.com">zinxmijares@gmail.com</a></strong>
-        try:
-            email_match = re.search(
-                r'Email:\s*<strong><a[^>]*>([^<]+)</a></strong>',
-                page_source
-            )
-            if email_match:
-                result['Email'] = email_match.group(1).strip()
-            else:
-                # Fallback: email without link
-                email_match2 = re.search(
-                    r'Email:\s*<strong>([^<]+)</strong>',
-                    page_source
-                )
-                if email_match2:
-                    result['Email'] = email_match2.group(1).strip()
-        except Exception as e:
-            print(f"    Warning: Could not find email: {e}")
-
-        # Extract Assigned Office
         # HTML: <span>Assigned Office:</span>\n<strong>Working Fusion</strong>
-        try:
-            office_match = re.search(
-                r'<span>Assigned Office:</span>\s*<strong>([^<]+)</strong>',
-                page_source
-            )
-            if office_match:
-                result['AssignedOffice'] = office_match.group(1).strip()
-        except Exception as e:
-            print(f"    Warning: Could not find Assigned Office: {e}")
-
-        print(f"    Scraped: {result['FirstName']} {result['LastName']} | {result['PhoneNumber']} | {result['Email']} | {result['AssignedOffice']}")
+        found = {}
+        for contact_match in CONTACT_RE.finditer(page_html):
+            field = contact_match.lastgroup
+            if field not in found:
+                found[field] = html.unescape(contact_match.group(field)).strip()
+                if {'PhoneNumber', 'EmailLink', 'AssignedOffice'} <= found.keys():
+                    break
+        result['PhoneNumber'] = found.get('PhoneNumber', '')
+        result['Email'] = found.get('EmailLink', found.get('Email', ''))
+        result['AssignedOffice'] = found.get('AssignedOffice', '')
+
+        logger.info("Scraped %s: %s %s | %s | %s | %s", client_id, result['FirstName'], result['LastName'],
+                    result['PhoneNumber'], result['Email'], result['AssignedOffice'])
         return result
 
     except Exception as e:
-        print(f"    Error scraping client {client_id}: {e}")
+        logger.error("Error scraping client %s: %s", client_id, e)
         return {
             'ClientID': client_id,
             'FirstName': '',
@@ -173,25 +185,141 @@ def scrape_client_info(driver, client_id):
         }
 
 
+def _cache_path():
+    return os.environ.get("CLIENT_INFO_CACHE", CACHE_FILE)
+
+
+def load_client_cache():
+    """Load cached client info from disk, or an empty dict if there is none
+
+    The cache is JSON Lines, one client per line; later lines for a ClientID win.
+    """
+    cache_file = _cache_path()
+    cache = {}
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # e.g. a half-written last line from an interrupted run
+                cache[entry['ClientID']] = entry
+    except FileNotFoundError:
+        return {}
+    except OSError as e:
+        logger.warning("Ignoring unreadable client cache %s: %s", cache_file, e)
+        return {}
+
+    logger.info("Loaded %d cached clients from %s", len(cache), cache_file)
+    return cache
+
+
+def save_client_cache(cache):
+    """Rewrite the cache file with one line per client, dropping superseded lines"""
+    cache_file = _cache_path()
+    tmp_file = f"{cache_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in cache.values())
+    os.replace(tmp_file, cache_file)
+    logger.info("Saved %d cached clients to %s", len(cache), cache_file)
+
+
+def _record_results(results, cache, cancel=None):
+    """Collect scrape results, appending each successful one to the cache file as it arrives
+
+    Progress survives a crash partway through: the next run resumes from whatever
+    made it to disk. Failed scrapes aren't cached, so they are retried next run.
+
+    Args:
+        results: Iterable of scrape_client_info results
+        cache: Dict of cached clients, updated in place
+        cancel: Optional threading.Event; once set, stop after the result in hand
+
+    Returns:
+        List of all results
+    """
+    collected = []
+    with open(_cache_path(), "a", encoding="utf-8") as f:
+        for result in results:
+            if cancel is not None and cancel.is_set():
+                break
+            collected.append(result)
+            if 'Error' not in result:
+                entry = {**result, 'last_scraped': datetime.now().isoformat()}
+                cache[result['ClientID']] = entry
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+    return collected
+
+
+def _is_stale(entry):
+    """True if a cached client was scraped more than CACHE_MAX_AGE_DAYS ago"""
+    try:
+        last_scraped = datetime.fromisoformat(entry['last_scraped'])
+    except (KeyError, TypeError, ValueError):
+        return True
+    return datetime.now() - last_scraped > timedelta(days=CACHE_MAX_AGE_DAYS)
+
+
+def _init_worker(username, password, log_level=None):
+    """Remember the credentials for this process's HTTP session; it logs in on first use
+
+    Nothing here can fail: an exception in a Pool initializer makes the pool restart
+    the worker forever, so the login happens in _get_worker_session instead.
+    Spawned workers start without logging configured, so pass the parent's level.
+    """
+    global _worker_credentials, _worker_session
+
+    if log_level is not None:
+        logging.basicConfig(level=log_level, format=LOG_FORMAT)
+    _worker_credentials = (username, password)
+    _worker_session = None
+
+
+def _get_worker_session():
+    """Return this process's logged-in HTTP session, logging in on first use"""
+    global _worker_session
+
+    if _worker_session is None:
+        username, password = _worker_credentials
+        try:
+            _worker_session = get_or_create_session(username, password)
+        except Exception as e:
+            raise Exception(f"ReliaTrax login failed in scraper worker: {e}") from e
+
+    return _worker_session
+
+
+def _scrape_worker(client_id):
+    """Scrape a single client with this process's session, at most one per MIN_REQUEST_INTERVAL"""
+    global _worker_last_request
+
+    # Only sleep for whatever is left of the interval; a slow response already paid for it
+    elapsed = time.monotonic() - _worker_last_request
+    if elapsed < MIN_REQUEST_INTERVAL:
+        time.sleep(MIN_REQUEST_INTERVAL - elapsed)
+    _worker_last_request = time.monotonic()
+
+    # Outside scrape_client_info's error handling: a failed login stops the scrape
+    # instead of being recorded as an error for every client
+    return scrape_client_info(_get_worker_session(), client_id)
+
+
+# Contact fields returned per client (scrape_client_info always sets every one)
+CLIENT_INFO_FIELDS = ('FirstName', 'LastName', 'DOB', 'Nickname', 'PhoneNumber', 'Email', 'AssignedOffice')
+_get_client_info_fields = itemgetter(*CLIENT_INFO_FIELDS)
+
+
 def results_to_dict(results):
     """Convert scraped results list to a dict keyed by ClientID for easy lookup"""
-    client_info_map = {}
-    for result in results:
-        client_id = result.get('ClientID', '')
-        if client_id:
-            client_info_map[client_id] = {
-                'FirstName': result.get('FirstName', ''),
-                'LastName': result.get('LastName', ''),
-                'DOB': result.get('DOB', ''),
-                'Nickname': result.get('Nickname', ''),
-                'PhoneNumber': result.get('PhoneNumber', ''),
-                'Email': result.get('Email', ''),
-                'AssignedOffice': result.get('AssignedOffice', '')
-            }
-    return client_info_map
-
-
-def scrape_all_clients(treatment_thread):
+    return {
+        result['ClientID']: dict(zip(CLIENT_INFO_FIELDS, _get_client_info_fields(result)))
+        for result in results
+        if result['ClientID']
+    }
+
+
+def scrape_all_clients(treatment_thread, cancel=None):
     """Main function to scrape all clients from treatment_thread data
 
     This can be called from data_cleaner.py with the treatment_thread data
@@ -199,12 +327,10 @@ def scrape_all_clients(treatment_thread):
 
     Args:
         treatment_thread: List of lists (with headers) from treatment_thread_export
+        cancel: Optional threading.Event a caller running this in the background sets to
+                stop the scrape early; clients scraped so far are still cached, and {} is returned
     """
-    print("="*60)
-    print("Client Information Scraper")
-    print("="*60)
-
-    driver = None
+    logger.info("Client Information Scraper starting")
 
     try:
         # Get credentials from environment
@@ -212,60 +338,90 @@ def scrape_all_clients(treatment_thread):
         password = os.environ.get('RELIATRAX_PASSWORD')
 
         if not username or not password:
-            print("WARNING: RELIATRAX_USERNAME or RELIATRAX_PASSWORD not set.")
-            print("Skipping client info scraping. Set these environment variables to enable.")
+            logger.warning("RELIATRAX_USERNAME or RELIATRAX_PASSWORD not set. "
+                           "Skipping client info scraping. Set these environment variables to enable.")
             return {}
 
         # Extract unique client IDs from treatment_thread data
         client_ids = get_unique_client_ids_from_treatment_thread(treatment_thread)
 
         if not client_ids:
-            print("No client IDs found to process")
+            logger.info("No client IDs found to process")
             return []
 
-        # Setup browser and login
-        print("\nSetting up browser...")
-        driver = setup_driver()
-        login_to_reliatrax(driver, username, password)
+        # Only clients missing from the cache (or cached too long ago) need fetching
+        cache = load_client_cache()
+        to_scrape = [c for c in client_ids if c not in cache or _is_stale(cache[c])]
+        logger.info("%d clients cached, %d to scrape", len(client_ids) - len(to_scrape), len(to_scrape))
 
-        # Scrape each client
-        print(f"\nScraping {len(client_ids)} clients...")
         results = []
+        if to_scrape:
+            workers = min(int(os.environ.get("WEFORTIFY_WORKERS", DEFAULT_WORKERS)), len(to_scrape))
+            logger.info("Scraping %d clients with %d worker(s)...", len(to_scrape), workers)
+
+            # Check the credentials once before starting any workers; the saved cookies
+            # then let each worker's session skip the login form
+            try:
+                get_or_create_session(username, password)
+            except Exception as e:
+                raise Exception(f"ReliaTrax login failed, not scraping client info: {e}") from e
+
+            if workers > 1:
+                # ~4 chunks per worker keeps workers evenly loaded however many clients need scraping
+                chunksize = max(1, len(to_scrape) // (workers * 4))
+                # Each worker logs in once; one request per client in flight per worker paces the server.
+                # Spawn, not fork: data_cleaner calls this from a background thread, and forking a
+                # threaded process can copy a lock some other thread holds and hang the child.
+                log_level = logging.getLogger().getEffectiveLevel()
+                with multiprocessing.get_context("spawn").Pool(processes=workers, initializer=_init_worker,
+                                                               initargs=(username, password, log_level)) as pool:
+                    results = _record_results(
+                        pool.imap_unordered(_scrape_worker, to_scrape, chunksize=chunksize), cache, cancel
+                    )
+                    # When cancelled, leaving the with block terminates the workers instead
+                    if not (cancel and cancel.is_set()):
+                        pool.close()
+                        pool.join()
+            else:
+                _init_worker(username, password)
+                results = _record_results(map(_scrape_worker, to_scrape), cache, cancel)
 
-        for i, client_id in enumerate(client_ids):
-            print(f"\n[{i+1}/{len(client_ids)}] Processing ClientID: {client_id}")
-            result = scrape_client_info(driver, client_id)
-            results.append(result)
+            # Compact the appended lines (re-scraped clients appear twice)
+            save_client_cache(cache)
 
-            # Small delay to avoid overwhelming the server
-            time.sleep(0.5)
+            if cancel and cancel.is_set():
+                logger.info("Client Information Scraper cancelled after %d clients", len(results))
+                return {}
 
-        print("\n" + "="*60)
-        print("Client Information Scraper completed!")
-        print("="*60)
+        logger.info("Client Information Scraper completed!")
 
-        # Return as dict keyed by ClientID for easy joining
-        return results_to_dict(results)
+        # Return as dict keyed by ClientID for easy joining, preferring cached info
+        # (a stale entry beats a blank one if its re-scrape failed)
+        failed = {result['ClientID']: result for result in results if 'Error' in result}
+        return results_to_dict([cache[c] if c in cache else failed[c] for c in client_ids])
 
     except Exception as e:
-        print(f"Error in scraper execution: {e}")
+        logger.error("Error in scraper execution: %s", e)
         raise
 
-    finally:
-        if driver:
-            driver.quit()
-            print("Browser closed.")
-
 
 def main():
     """Standalone execution - reads treatment_thread from Google Sheets"""
-    print("Running in standalone mode - fetching treatment_thread from Sheets...")
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    logger.info("Running in standalone mode - fetching treatment_thread from Sheets...")
 
-    # Get Google Sheets client and fetch treatment_thread data
+    # Get Google Sheets client and fetch only the ClientID column of treatment_thread
     sheets_client = get_sheets_client()
     spreadsheet = sheets_client.open_by_key(SHEET_ID)
-    worksheet = spreadsheet.worksheet("treatment_thread_export")
-    treatment_thread = worksheet.get_all_values()
+
+    headers = spreadsheet.values_get(f"'{TREATMENT_THREAD_WORKSHEET}'!1:1").get('values', [[]])[0]
+    col_letter = gspread.utils.rowcol_to_a1(1, headers.index('ClientID') + 1).rstrip('1')
+    column = spreadsheet.values_get(
+        f"'{TREATMENT_THREAD_WORKSHEET}'!{col_letter}:{col_letter}"
+    ).get('values', [])
+
+    # Blank cells come back as empty rows; keep the header + rows shape scrape_all_clients expects
+    treatment_thread = [[row[0] if row else ''] for row in column]
 
     # Run the scraper
     scrape_all_clients(treatment_thread)
@@ -4,18 +4,32 @@ Processes raw exported data into analytical frames (long, wide, yoy).
 """
 import gspread
 import os
-import json
-import platform
+import logging
+import re
+import sys
+import threading
+import pandas as pd
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from operator import itemgetter
 from dateutil.relativedelta import relativedelta
-from oauth2client.service_account import ServiceAccountCredentials
 
-from client_info_scraper import scrape_all_clients
+from client_info_scraper import LOG_FORMAT, scrape_all_clients
+from utils import get_sheets_client
 
 
 # Configuration
 SHEET_ID = "196rg3YfpssRLsdFig4yN9G3U9NrQFPEeROnr1oSNGCA"
 
+# Identifier columns repeated on nearly every row; interned on read so each distinct ID is one string
+INTERNED_COLUMNS = {'PatientID', 'ClientID', 'TreatmentCode', 'QuestionCode', 'Code', 'Document'}
+
+# Most rows sent in one values_batch_update when flushing queued sheet writes, so each
+# request stays small enough not to time out; BATCH_CELL_LIMIT caps very wide tabs too
+BATCH_ROW_LIMIT = 5000
+BATCH_CELL_LIMIT = 2_000_000
+
 # Survey Configuration
 SS_SURVEY_CODE = 9000
 SS_QUESTION_CODES = [
@@ -67,40 +81,60 @@ PROGRAM_YEARS = {
 }
 
 
-def get_sheets_client():
-    """Get authenticated Google Sheets client"""
-    import warnings
-    warnings.filterwarnings('ignore', category=DeprecationWarning)
-
-    scope = [
-        'https://spreadsheets.google.com/feeds',
-        'https://www.googleapis.com/auth/drive'
-    ]
-
-    creds_dict = json.loads(os.environ['GOOGLE_SHEETS_CREDS'])
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    return gspread.authorize(creds)
-
-
 def read_sheet_data(client, sheet_id, worksheet_name):
     """Read all data from a worksheet"""
     print(f"Reading data from {worksheet_name}...")
     spreadsheet = client.open_by_key(sheet_id)
     worksheet = spreadsheet.worksheet(worksheet_name)
-    data = worksheet.get_all_values()
+    data = intern_id_columns(worksheet.get_all_values())
     print(f"  Loaded {len(data)-1} rows")
     return data
 
 
-def write_sheet_data(client, sheet_id, worksheet_name, data):
-    """Write data to a worksheet, clearing it first"""
+def read_sheets_data(spreadsheet, worksheet_names):
+    """Read all data from several worksheets in a single values_batch_get request
+
+    Returns one list of rows per worksheet, padded like get_all_values().
+    """
+    print(f"Reading data from {', '.join(worksheet_names)}...")
+    ranges = ["'{}'".format(name.replace("'", "''")) for name in worksheet_names]
+    response = spreadsheet.values_batch_get(ranges)
+
+    sheets_data = []
+    for name, value_range in zip(worksheet_names, response.get('valueRanges', [])):
+        values = value_range.get('values', [])
+        data = intern_id_columns(gspread.utils.fill_gaps(values)) if values else []
+        print(f"  Loaded {len(data)-1} rows from {name}")
+        sheets_data.append(data)
+    return sheets_data
+
+
+def intern_id_columns(data):
+    """Intern the INTERNED_COLUMNS cells of sheet data in place (and return it)"""
+    if not data:
+        return data
+    id_indices = [idx for idx, header in enumerate(data[0]) if header in INTERNED_COLUMNS]
+    for row in data[1:]:
+        for idx in id_indices:
+            row[idx] = sys.intern(row[idx])
+    return data
+
+
+def write_sheet_data(client, sheet_id, worksheet_name, data, batch=None):
+    """Write data to a worksheet, replacing its previous contents
+
+    If batch (from new_sheet_write_batch) is given the write is only queued, and is
+    sent together with every other queued write by flush_sheet_writes.
+    """
     print(f"Writing {len(data)-1} rows to {worksheet_name}...")
-    spreadsheet = client.open_by_key(sheet_id)
+    if batch is not None:
+        spreadsheet = batch['spreadsheet']
+    else:
+        spreadsheet = client.open_by_key(sheet_id)
 
     try:
         worksheet = spreadsheet.worksheet(worksheet_name)
-        worksheet.clear()
-    except:
+    except gspread.exceptions.WorksheetNotFound:
         # Create worksheet if it doesn't exist
         worksheet = spreadsheet.add_worksheet(title=worksheet_name, rows=len(data), cols=len(data[0]))
 
@@ -151,12 +185,25 @@ def write_sheet_data(client, sheet_id, worksheet_name, data):
                 cleaned_row.append(cell)
         cleaned_data.append(cleaned_row)
 
-    # Upload data
-    worksheet.update('A1', cleaned_data, value_input_option='USER_ENTERED')
+    flush_now = batch is None
+    if flush_now:
+        batch = new_sheet_write_batch(spreadsheet)
 
-    # Apply date formatting to date columns
+    # Queue the values; USER_ENTERED so dates, numbers and the ' ID prefix are parsed as typed
+    batch['data'].append({'range': f"'{worksheet.title}'!A1", 'values': cleaned_data})
+
+    # Clear the previous values (batched instead of a separate clear() call up front);
+    # flush_sheet_writes sends the clears before any of the new values
+    batch['clears'].append({
+        'updateCells': {
+            'range': {'sheetId': worksheet.id},
+            'fields': 'userEnteredValue'
+        }
+    })
+
+    # Apply date formatting to date columns; sent after the values, which grow the grid to fit
+    requests = batch['requests']
     if date_columns:
-        requests = []
         for col_idx in date_columns:
             requests.append({
                 'repeatCell': {
@@ -179,15 +226,62 @@ def write_sheet_data(client, sheet_id, worksheet_name, data):
                 }
             })
 
-        if requests:
-            spreadsheet.batch_update({'requests': requests})
+    if flush_now:
+        flush_sheet_writes(batch)
+        print(f"  ✓ Written successfully")
+    else:
+        print(f"  Queued")
+
 
-    print(f"  ✓ Written successfully")
+def new_sheet_write_batch(spreadsheet):
+    """Start a batch of writes to spreadsheet for write_sheet_data(..., batch=...)"""
+    return {'spreadsheet': spreadsheet, 'clears': [], 'data': [], 'requests': []}
+
+
+def flush_sheet_writes(batch):
+    """Send every queued write: the clears in one batch_update, the values, then the formats
+
+    Clearing first means a failure partway through leaves tabs empty or partly written,
+    never new rows mixed with stale ones from the previous contents. Formats go last
+    because their ranges can reach past a tab's old grid until the values have grown it.
+
+    Each values_batch_update carries at most BATCH_ROW_LIMIT rows (and BATCH_CELL_LIMIT
+    cells), packing small tabs together; a bigger tab is sent as consecutive row blocks.
+    """
+    spreadsheet = batch['spreadsheet']
+    if batch['clears']:
+        spreadsheet.batch_update({'requests': batch['clears']})
+
+    chunk, chunk_rows, chunk_cells = [], 0, 0
+    for entry in batch['data']:
+        values = entry['values']
+        sheet_range = entry['range'].rsplit('!', 1)[0]
+        width = max((len(row) for row in values), default=1)
+        rows_per_part = max(1, min(BATCH_ROW_LIMIT, BATCH_CELL_LIMIT // max(width, 1)))
+        for start in range(0, len(values), rows_per_part):
+            part = values[start:start + rows_per_part]
+            cells = sum(len(row) for row in part)
+            if chunk and (chunk_rows + len(part) > BATCH_ROW_LIMIT or chunk_cells + cells > BATCH_CELL_LIMIT):
+                spreadsheet.values_batch_update({'valueInputOption': 'USER_ENTERED', 'data': chunk})
+                chunk, chunk_rows, chunk_cells = [], 0, 0
+            chunk.append({'range': f"{sheet_range}!A{start + 1}", 'values': part})
+            chunk_rows += len(part)
+            chunk_cells += cells
+    if chunk:
+        spreadsheet.values_batch_update({'valueInputOption': 'USER_ENTERED', 'data': chunk})
+
+    if batch['requests']:
+        spreadsheet.batch_update({'requests': batch['requests']})
+
+    batch['clears'], batch['data'], batch['requests'] = [], [], []
 
 
 def get_column_indices(headers):
-    """Convert list of headers to column index dict"""
-    return {col: headers.index(col) if col in headers else -1 for col in headers}
+    """Convert list of headers to column index dict (first occurrence wins for duplicates)"""
+    indices = {}
+    for idx, col in enumerate(headers):
+        indices.setdefault(col, idx)
+    return indices
 
 
 def get_survey_code_name_mapping(assess_dict):
@@ -240,7 +334,7 @@ def get_unique_treatment_question_pairs(assess_dict):
         survey_code = row[col['TreatmentCode']]
         survey_name = row[col['Document']]
         question_code = row[col['QuestionCode']]
-        key = f"{survey_code}|{question_code}"
+        key = (survey_code, question_code)
 
         if key not in unique_pairs:
             unique_pairs.add(key)
@@ -276,6 +370,11 @@ def create_skeleton(daily_summary, unique_pairs):
 
     skeleton_data = [['PatientID', 'TreatmentDate', 'TreatmentCode', 'SurveyName', 'QuestionCode']]
 
+    # Index the survey-question pairs by survey code once instead of scanning them per row
+    pairs_by_code = {}
+    for pair_survey_code, survey_name, question_code in unique_pairs:
+        pairs_by_code.setdefault(pair_survey_code, []).append((survey_name, question_code))
+
     for row in daily_summary[1:]:
         patient_id = row[col['PatientID']]
         survey_code = row[col['TreatmentCode']]
@@ -295,43 +394,55 @@ def create_skeleton(daily_summary, unique_pairs):
         try:
             date_obj = parse_date_flexible(survey_date)
             # Store as date-only string
-            survey_date_only = date_obj.strftime('%m/%d/%Y')
+            survey_date_only = f"{date_obj.month:02d}/{date_obj.day:02d}/{date_obj.year}"
         except:
             survey_date_only = survey_date
 
         # Add row for each question in this survey
-        for pair_survey_code, survey_name, question_code in unique_pairs:
-            if pair_survey_code == str(survey_code):
-                skeleton_data.append([patient_id, survey_date_only, survey_code, survey_name, question_code])
+        skeleton_data.extend([patient_id, survey_date_only, survey_code, survey_name, question_code]
+                             for survey_name, question_code in pairs_by_code.get(str(survey_code), ()))
 
     print(f"  Created skeleton with {len(skeleton_data)-1} rows")
     return skeleton_data
 
 
+def format_instance_date(date_value):
+    """Format a date as M-D-YYYY (date only) for treatment instance codes"""
+    try:
+        # Parse date (e.g., "1/19/2026")
+        date_obj = parse_date_flexible(date_value)
+        return f"{date_obj.month}-{date_obj.day}-{date_obj.year}"
+    except Exception:
+        # Fallback to just the date string if something goes wrong
+        return str(date_value).replace('/', '-')
+
+
+def format_instance_dates(date_values):
+    """Format a whole column of dates with format_instance_date, once per distinct value"""
+    dates = pd.Series(date_values, dtype=object)
+    distinct_dates = dates.unique()
+    return dates.map(dict(zip(distinct_dates, map(format_instance_date, distinct_dates)))).tolist()
+
+
 def generate_instance_codes(skeleton_data):
     """Add treatment instance codes and question treatment instance codes"""
     print("Generating instance codes...")
     headers = skeleton_data[0]
 
-    output_data = [headers + ['TreatmentInstanceCode', 'QuestionTreatmentInstanceCode']]
+    rows = skeleton_data[1:]
 
-    for row in skeleton_data[1:]:
-        patient_id = row[0]
-        survey_date = row[1]
-        question_code = row[4]
+    # Build the new columns whole, then attach them to the rows in one pass
+    # Format as M-D-YYYY (DATE ONLY, no time)
+    formatted_dates = format_instance_dates([row[1] for row in rows])
+    treatment_instance_codes = [f"{row[0]}-{formatted_date}"
+                                for row, formatted_date in zip(rows, formatted_dates)]
+    question_treatment_instance_codes = [f"{instance_code}-{row[4]}"
+                                         for row, instance_code in zip(rows, treatment_instance_codes)]
 
-        # Parse date and format as M-D-YYYY (DATE ONLY, no time)
-        try:
-            date_obj = parse_date_flexible(survey_date)
-            # Use date-only format for instance codes
-            formatted_date = date_obj.strftime('%-m-%-d-%Y') if platform.system() != 'Windows' else date_obj.strftime('%#m-%#d-%Y')
-        except:
-            formatted_date = str(survey_date).replace('/', '-')
-
-        treatment_instance_code = f"{patient_id}-{formatted_date}"
-        question_treatment_instance_code = f"{treatment_instance_code}-{question_code}"
-
-        output_data.append(row + [treatment_instance_code, question_treatment_instance_code])
+    output_data = [headers + ['TreatmentInstanceCode', 'QuestionTreatmentInstanceCode']]
+    output_data += [row + [instance_code, question_instance_code]
+                    for row, instance_code, question_instance_code
+                    in zip(rows, treatment_instance_codes, question_treatment_instance_codes)]
 
     print(f"  Generated codes for {len(output_data)-1} rows")
     return output_data
@@ -345,42 +456,35 @@ def process_treatment_thread_export(treatment_thread, survey_mapping, value_clea
 
     full_headers = headers + ['TreatmentCode', 'TreatmentInstanceCode',
                               'QuestionTreatmentInstanceCode', 'CleanedValue']
-    full_data = []
+    rows = treatment_thread[1:]
 
+    patient_idx = col['ClientID']
+    survey_idx = col['Document']
+    question_idx = col['Code']
     value_col_index = headers.index('Value')
 
-    for row in treatment_thread[1:]:
-        patient_id = row[col['ClientID']]
-        date_value = row[col['Date']]
-        # Note: Time column exists but we ignore it - using date-only for matching
-        survey_name = row[col['Document']]
-        question_code = row[col['Code']]
-        raw_value = row[value_col_index]
+    # Build the new columns whole, then attach them to the rows in one pass
+    survey_codes = [survey_mapping.get(row[survey_idx], '') for row in rows]
 
-        survey_code = survey_mapping.get(survey_name, '')
+    # Format dates as M-D-YYYY (DATE ONLY, no time)
+    # Note: Time column exists but we ignore it - using date-only for matching
+    formatted_dates = format_instance_dates([row[col['Date']] for row in rows])
+    treatment_instance_codes = [f"{row[patient_idx]}-{formatted_date}"
+                                for row, formatted_date in zip(rows, formatted_dates)]
+    question_treatment_instance_codes = [f"{instance_code}-{row[question_idx]}"
+                                         for row, instance_code in zip(rows, treatment_instance_codes)]
 
-        # Clean the value
-        cleaned_value = value_cleaning_map.get(raw_value, raw_value)
+    # Clean the value
+    cleaned_values = [value_cleaning_map.get(row[value_col_index], row[value_col_index]) for row in rows]
 
-        # Parse date only (ignore time for matching purposes)
-        try:
-            # Parse date (e.g., "1/19/2026")
-            date_obj = parse_date_flexible(date_value)
+    full_data = [full_headers]
+    full_data += [row + [survey_code, instance_code, question_instance_code, cleaned_value]
+                  for row, survey_code, instance_code, question_instance_code, cleaned_value
+                  in zip(rows, survey_codes, treatment_instance_codes,
+                         question_treatment_instance_codes, cleaned_values)]
 
-            # Format as M-D-YYYY (DATE ONLY, no time)
-            formatted_date = date_obj.strftime('%-m-%-d-%Y') if platform.system() != 'Windows' else date_obj.strftime('%#m-%#d-%Y')
-        except Exception:
-            # Fallback to just the date string if something goes wrong
-            formatted_date = str(date_value).replace('/', '-')
-
-        treatment_instance_code = f"{patient_id}-{formatted_date}"
-        question_treatment_instance_code = f"{treatment_instance_code}-{question_code}"
-
-        full_data.append(row + [survey_code, treatment_instance_code,
-                               question_treatment_instance_code, cleaned_value])
-
-    print(f"  Processed {len(full_data)} rows")
-    return [full_headers] + full_data
+    print(f"  Processed {len(full_data)-1} rows")
+    return full_data
 
 
 def join_skeleton_with_responses(skeleton_data, response_data):
@@ -389,33 +493,22 @@ def join_skeleton_with_responses(skeleton_data, response_data):
     skeleton_headers = skeleton_data[0]
     response_headers = response_data[0]
 
-    # Build lookup map
-    response_map = {}
+    # Build lookup map (later responses for the same key win)
     response_key_index = response_headers.index('QuestionTreatmentInstanceCode')
     response_value_index = response_headers.index('CleanedValue')
-
-    for row in response_data[1:]:
-        key = row[response_key_index]
-        value = row[response_value_index]
-        response_map[key] = value
+    response_map = dict(zip([row[response_key_index] for row in response_data[1:]],
+                            [row[response_value_index] for row in response_data[1:]]))
 
     print(f"  Built response map with {len(response_map)} responses")
 
     # Join data
-    output_data = [skeleton_headers + ['Value']]
     skeleton_key_index = skeleton_headers.index('QuestionTreatmentInstanceCode')
+    values = [response_map.get(row[skeleton_key_index], '') for row in skeleton_data[1:]]
+    output_data = [skeleton_headers + ['Value']]
+    output_data += [row + [value] for row, value in zip(skeleton_data[1:], values)]
 
-    matched_count = 0
-    unmatched_count = 0
-
-    for row in skeleton_data[1:]:
-        key = row[skeleton_key_index]
-        value = response_map.get(key, '')
-        if value != '':
-            matched_count += 1
-        else:
-            unmatched_count += 1
-        output_data.append(row + [value])
+    unmatched_count = values.count('')
+    matched_count = len(values) - unmatched_count
 
     print(f"  Joined data: {len(output_data)-1} rows")
     print(f"  Matched: {matched_count} rows, Unmatched: {unmatched_count} rows")
@@ -434,6 +527,21 @@ def join_skeleton_with_responses(skeleton_data, response_data):
     return output_data
 
 
+# Successfully parsed date strings; the same dates repeat across every patient and question
+_DATE_CACHE = {}
+
+# The only format that can match a date string, keyed by its shape:
+# (contains '/', contains ':', contains AM/PM letters)
+_DATE_FORMATS_BY_SHAPE = {
+    (False, True, False): '%Y-%m-%d %H:%M:%S',
+    (True, True, True): '%m/%d/%Y %I:%M:%S %p',  # 4/11/2022 11:53:28 PM
+    (True, True, False): '%m/%d/%Y %H:%M:%S',
+    (False, False, False): '%Y-%m-%d',
+    (True, False, False): '%m/%d/%Y'           # 1/19/2026
+}
+_LETTER_RE = re.compile(r'[A-Za-z]')
+
+
 def parse_date_flexible(date_value):
     """Parse date from various formats"""
     if isinstance(date_value, datetime):
@@ -442,20 +550,21 @@ def parse_date_flexible(date_value):
     if not isinstance(date_value, str):
         return datetime.now()
 
-    # Try multiple date formats
-    formats = [
-        '%Y-%m-%d %H:%M:%S',
-        '%m/%d/%Y %I:%M:%S %p',  # 4/11/2022 11:53:28 PM
-        '%m/%d/%Y %H:%M:%S',
-        '%Y-%m-%d',
-        '%m/%d/%Y'           # 1/19/2026
-    ]
+    cached = _DATE_CACHE.get(date_value)
+    if cached is not None:
+        return cached
 
-    for fmt in formats:
+    # Pick the format from the string's shape instead of trying each one in turn
+    shape = ('/' in date_value, ':' in date_value, _LETTER_RE.search(date_value) is not None)
+    fmt = _DATE_FORMATS_BY_SHAPE.get(shape)
+    if fmt is not None:
         try:
-            return datetime.strptime(date_value, fmt)
-        except:
-            continue
+            result = datetime.strptime(date_value, fmt)
+        except ValueError:
+            pass
+        else:
+            _DATE_CACHE[date_value] = result
+            return result
 
     # If all fail, return current time
     print(f"Warning: Could not parse date '{date_value}'")
@@ -496,35 +605,32 @@ def fill_forward_values(joined_data):
     col = get_column_indices(headers)
 
     output_headers = headers + ['IsImputed']
-
-    # Sort by PatientID, QuestionCode, TreatmentDate
     data_rows = joined_data[1:]
-    data_rows.sort(key=lambda x: (
-        x[col['PatientID']],
-        x[col['QuestionCode']],
-        parse_date_flexible(x[col['TreatmentDate']])
-    ))
-
-    # Fill forward
-    last_values = {}
-    output_data = [output_headers]
+    value_idx = col['Value']
 
-    for row in data_rows:
-        patient_id = row[col['PatientID']]
-        question_code = row[col['QuestionCode']]
-        value = row[col['Value']]
-        key = f"{patient_id}|{question_code}"
+    frame = pd.DataFrame(data_rows, columns=headers, dtype=object)
 
-        if value == '' or value is None:
-            if key in last_values:
-                row[col['Value']] = last_values[key]
-                is_imputed = 'Yes'
-            else:
-                is_imputed = ''
-        else:
-            last_values[key] = value
-            is_imputed = 'No'
+    # Parse each distinct date once rather than once per row
+    distinct_dates = frame['TreatmentDate'].unique()
+    frame['TreatmentDate'] = frame['TreatmentDate'].map(
+        dict(zip(distinct_dates, map(parse_date_flexible, distinct_dates))))
+
+    # Sort by PatientID, QuestionCode, TreatmentDate (stable, like list.sort)
+    frame = frame.sort_values(['PatientID', 'QuestionCode', 'TreatmentDate'], kind='stable')
+
+    # Fill forward the last non-empty value within each patient+question
+    missing = frame['Value'].isna() | (frame['Value'] == '')
+    filled = frame['Value'].mask(missing).groupby(
+        [frame['PatientID'], frame['QuestionCode']], sort=False, dropna=False).ffill()
+    imputed = missing & filled.notna()
+
+    values = frame['Value'].mask(imputed, filled).tolist()
+    flags = pd.Series('No', index=frame.index).mask(missing, '').mask(imputed, 'Yes').tolist()
 
+    output_data = [output_headers]
+    for row_idx, value, is_imputed in zip(frame.index, values, flags):
+        row = data_rows[row_idx]
+        row[value_idx] = value
         output_data.append(row + [is_imputed])
 
     print(f"  Fill forward complete: {len(output_data)-1} rows")
@@ -538,25 +644,29 @@ def stage_data(data, name_map, column_order):
     col = get_column_indices(headers)
 
     enriched_headers = headers + ['FirstName', 'LastName']
-    enriched_data = [enriched_headers]
+    patient_idx = col['PatientID']
+    width = len(headers)
 
-    for row in data[1:]:
-        patient_id = row[col['PatientID']]
-        names = name_map.get(patient_id, {'FirstName': '', 'LastName': ''})
-        enriched_data.append(row + [names['FirstName'], names['LastName']])
+    # (FirstName, LastName) per patient, standing in for the two appended columns
+    no_names = ('', '')
+    names_by_patient = {patient_id: (names['FirstName'], names['LastName'])
+                        for patient_id, names in name_map.items()}
 
-    # Reorder if specified
+    # Reorder if specified, picking each output cell straight from the source row or its
+    # patient's names so no intermediate enriched row is built
     if column_order:
         column_indices = [enriched_headers.index(col) for col in column_order]
         output_data = [column_order]
-
-        for row in enriched_data[1:]:
-            reordered_row = [row[i] for i in column_indices]
-            output_data.append(reordered_row)
+        for row in data[1:]:
+            names = names_by_patient.get(row[patient_idx], no_names)
+            output_data.append([row[i] if i < width else names[i - width] for i in column_indices])
 
         print(f"  Staged {len(output_data)-1} rows with {len(column_order)} columns")
         return output_data
 
+    enriched_data = [enriched_headers]
+    enriched_data += [row + list(names_by_patient.get(row[patient_idx], no_names)) for row in data[1:]]
+
     print(f"  Staged {len(enriched_data)-1} rows")
     return enriched_data
 
@@ -573,15 +683,14 @@ def build_client_date_frame_distinct(assessment_frame_values):
 
     headers = assessment_frame_values[0]
     col = get_column_indices(headers)
+    get_keys = itemgetter(col['PatientID'], col['TreatmentCode'],
+                          col['TreatmentInstanceCode'], col['TreatmentDate'])
 
-    # Group by PatientID|TreatmentCode
+    # Group by (PatientID, TreatmentCode)
     groups = {}
 
     for row in assessment_frame_values[1:]:
-        patient_id = row[col['PatientID']]
-        treatment_code = row[col['TreatmentCode']]
-        instance_code = row[col['TreatmentInstanceCode']]
-        treatment_date = row[col['TreatmentDate']]
+        patient_id, treatment_code, instance_code, treatment_date = get_keys(row)
 
         if not patient_id or not treatment_code or not instance_code:
             continue
@@ -592,7 +701,7 @@ def build_client_date_frame_distinct(assessment_frame_values):
         except:
             continue
 
-        key = f"{patient_id}|{treatment_code}"
+        key = (patient_id, treatment_code)
 
         if key not in groups:
             groups[key] = {
@@ -604,13 +713,11 @@ def build_client_date_frame_distinct(assessment_frame_values):
                 'instances': {}
             }
 
-        # Store date for each instance (dedupe)
-        if instance_code not in groups[key]['instances']:
-            groups[key]['instances'][instance_code] = date_obj
-        else:
-            # Keep earliest if duplicates
-            if date_obj < groups[key]['instances'][instance_code]:
-                groups[key]['instances'][instance_code] = date_obj
+        # Store date for each instance (dedupe, keeping the earliest if duplicates)
+        instances = groups[key]['instances']
+        earliest = instances.get(instance_code)
+        if earliest is None or date_obj < earliest:
+            instances[instance_code] = date_obj
 
     # Output headers
     out_headers = [
@@ -636,9 +743,8 @@ def build_client_date_frame_distinct(assessment_frame_values):
     out = [out_headers]
 
     for key, group in groups.items():
-        instances_arr = [{'code': code, 'date': date}
-                        for code, date in group['instances'].items()]
-        instances_arr.sort(key=lambda x: x['date'])
+        # (code, date) pairs sorted by date; plain tuples rather than a dict per instance
+        instances_arr = sorted(group['instances'].items(), key=itemgetter(1))
 
         total_assessments = len(instances_arr)
 
@@ -648,19 +754,19 @@ def build_client_date_frame_distinct(assessment_frame_values):
 
         if overall_end:
             for inst in instances_arr:
-                if inst['code'] != overall_end['code']:
+                if inst[0] != overall_end[0]:
                     overall_start = inst
                     break
 
         include_all_time = 'Yes' if (total_assessments >= 2 and overall_start and
-                                     overall_end and overall_start['code'] != overall_end['code']) else ''
+                                     overall_end and overall_start[0] != overall_end[0]) else ''
 
-        # Bucket by program year
+        # Bucket by program year: instances are sorted by date, so each year is a slice
+        dates = [inst[1] for inst in instances_arr]
         by_py = {}
         for year, config in PROGRAM_YEARS.items():
-            by_py[year] = [inst for inst in instances_arr
-                          if config['start'] <= inst['date'] <= config['end']]
-            by_py[year].sort(key=lambda x: x['date'])
+            by_py[year] = instances_arr[bisect_left(dates, config['start']):
+                                        bisect_right(dates, config['end'])]
 
         def compute_year(year):
             cur = by_py[year]
@@ -675,7 +781,7 @@ def build_client_date_frame_distinct(assessment_frame_values):
             # Find starting assessment
             starting = None
             for inst in cur:
-                if inst['code'] != ending['code']:
+                if inst[0] != ending[0]:
                     starting = inst
                     break
 
@@ -684,17 +790,17 @@ def build_client_date_frame_distinct(assessment_frame_values):
                 prev_year = PROGRAM_YEARS[year].get('prev')
                 if prev_year and by_py[prev_year]:
                     prev_latest = by_py[prev_year][-1]
-                    if prev_latest['code'] != ending['code']:
+                    if prev_latest[0] != ending[0]:
                         starting = prev_latest
 
             eligible = (total_assessments >= 2 and starting and
-                       starting['code'] != ending['code'])
+                       starting[0] != ending[0])
 
             return {
-                'startDate': starting['date'] if starting else '',
-                'startCode': starting['code'] if starting else '',
-                'endDate': ending['date'],
-                'endCode': ending['code'],
+                'startDate': starting[1] if starting else '',
+                'startCode': starting[0] if starting else '',
+                'endDate': ending[1],
+                'endCode': ending[0],
                 'include': 'Yes' if eligible else ''
             }
 
@@ -718,10 +824,10 @@ def build_client_date_frame_distinct(assessment_frame_values):
             y2026['endDate'], y2026['endCode'],
             y2026['include'],
 
-            overall_start['date'] if overall_start else '',
-            overall_start['code'] if overall_start else '',
-            overall_end['date'] if overall_end else '',
-            overall_end['code'] if overall_end else '',
+            overall_start[1] if overall_start else '',
+            overall_start[0] if overall_start else '',
+            overall_end[1] if overall_end else '',
+            overall_end[0] if overall_end else '',
             include_all_time
         ])
 
@@ -730,11 +836,15 @@ def build_client_date_frame_distinct(assessment_frame_values):
 
 
 def pivot_client_date_frame_to_long_with_aggregations(
-    client_date_frame_values, assessment_frame_values, aggregation_config
+    client_date_frame_values, assessment_frame_values, aggregation_config,
+    skip_empty_program_years=False
 ):
     """
     Pivot client date frame to long format with per-question rows plus aggregations.
     Includes program year rollups and custom category rollups.
+
+    If skip_empty_program_years is set, program years where the client has no start or
+    end assessment and isn't eligible are left out (their rows would be all blank).
     """
     print("Pivoting to long format with aggregations...")
 
@@ -752,8 +862,18 @@ def pivot_client_date_frame_to_long_with_aggregations(
     a_hdr = assessment_frame_values[0]
     a_col = get_column_indices(a_hdr)
 
-    # Build lookup: (TreatmentInstanceCode|QuestionCode) -> Value
+    def to_number_or_none(v):
+        if v == '' or v is None:
+            return None
+        try:
+            return float(v)
+        except:
+            return None
+
+    # Build lookups: (TreatmentInstanceCode, QuestionCode) -> Value, and -> numeric Value
+    # (converted once here rather than on every rollup and movement that reads it)
     value_by_instance_question = {}
+    number_by_instance_question = {}
     questions_by_treatment = {}
 
     for row in assessment_frame_values[1:]:
@@ -765,9 +885,10 @@ def pivot_client_date_frame_to_long_with_aggregations(
         if not inst or not t_code or not q_code:
             continue
 
-        key = f"{inst}|{q_code}"
+        key = (inst, q_code)
         if key not in value_by_instance_question:
             value_by_instance_question[key] = val
+            number_by_instance_question[key] = to_number_or_none(val)
 
         if t_code not in questions_by_treatment:
             questions_by_treatment[t_code] = set()
@@ -776,33 +897,22 @@ def pivot_client_date_frame_to_long_with_aggregations(
     def get_value(inst_code, q_code):
         if not inst_code:
             return ''
-        v = value_by_instance_question.get(f"{inst_code}|{q_code}")
+        v = value_by_instance_question.get((inst_code, q_code))
         return '' if v is None else v
 
-    def to_number_or_none(v):
-        if v == '' or v is None:
-            return None
-        try:
-            return float(v)
-        except:
+    def get_number(inst_code, q_code):
+        if not inst_code:
             return None
+        return number_by_instance_question.get((inst_code, q_code))
 
-    def sum_numeric(values):
-        total = 0
-        saw_any = False
-        for v in values:
-            n = to_number_or_none(v)
-            if n is not None:
-                total += n
-                saw_any = True
-        return total if saw_any else ''
-
-    def movement(start_val, end_val):
-        s = to_number_or_none(start_val)
-        e = to_number_or_none(end_val)
-        if s is None or e is None:
+    def sum_numeric(numbers):
+        present = [n for n in numbers if n is not None]
+        return sum(present) if present else ''
+
+    def movement(start_num, end_num):
+        if start_num is None or end_num is None:
             return ''
-        return e - s
+        return end_num - start_num
 
     def to_bool(v):
         if v in [True, 1]:
@@ -858,25 +968,34 @@ def pivot_client_date_frame_to_long_with_aggregations(
         }
     ]
 
-    def push_row(base, q_code, py_label, start_val, end_val, start_date,
-                end_date, start_inst, end_inst, eligible_bool):
+    def push_row(base, q_code, py_label, start_val, end_val, start_num, end_num,
+                start_date, end_date, start_inst, end_inst, eligible_bool):
         out.append([
             base['patientID'], base['firstName'], base['lastName'],
             base['surveyName'], base['treatmentCode'],
-            q_code, py_label, start_val, end_val, movement(start_val, end_val),
+            q_code, py_label, start_val, end_val, movement(start_num, end_num),
             start_date or '', end_date or '',
             start_inst or '', end_inst or '',
             eligible_bool
         ])
 
+    # Resolve every column index once instead of per row and program year
+    get_base = itemgetter(*(c_col[name] for name in
+                            ('PatientID', 'FirstName', 'LastName', 'SurveyName', 'TreatmentCode')))
+    for py in program_years:
+        py['get_cols'] = itemgetter(*(c_col[py[key]] for key in
+                                      ('start_code_col', 'end_code_col', 'start_date_col',
+                                       'end_date_col', 'eligible_col')))
+
     # Expand to long format with rollups
     for row in client_date_frame_values[1:]:
+        patient_id, first_name, last_name, survey_name, treatment_code = get_base(row)
         base = {
-            'patientID': row[c_col['PatientID']],
-            'firstName': row[c_col['FirstName']] or '',
-            'lastName': row[c_col['LastName']] or '',
-            'surveyName': row[c_col['SurveyName']] or '',
-            'treatmentCode': row[c_col['TreatmentCode']]
+            'patientID': patient_id,
+            'firstName': first_name or '',
+            'lastName': last_name or '',
+            'surveyName': survey_name or '',
+            'treatmentCode': treatment_code
         }
 
         if not base['patientID'] or not base['treatmentCode']:
@@ -886,30 +1005,44 @@ def pivot_client_date_frame_to_long_with_aggregations(
         custom_cats = aggregation_config.get(str(base['treatmentCode']), {})
 
         for py in program_years:
-            start_inst = row[c_col[py['start_code_col']]] or ''
-            end_inst = row[c_col[py['end_code_col']]] or ''
-            start_date = row[c_col[py['start_date_col']]] or ''
-            end_date = row[c_col[py['end_date_col']]] or ''
-            eligible_bool = to_bool(row[c_col[py['eligible_col']]])
+            start_inst, end_inst, start_date, end_date, eligible = py['get_cols'](row)
+            start_inst = start_inst or ''
+            end_inst = end_inst or ''
+            start_date = start_date or ''
+            end_date = end_date or ''
+            eligible_bool = to_bool(eligible)
+
+            if not start_inst and not end_inst and not eligible_bool and skip_empty_program_years:
+                continue
+
+            # Look each question's start/end number up once for every rollup
+            start_nums = {q: get_number(start_inst, q) for q in treatment_questions}
+            end_nums = {q: get_number(end_inst, q) for q in treatment_questions}
 
             # 1) Per-question rows
             for q_code in treatment_questions:
-                s_val = get_value(start_inst, q_code)
-                e_val = get_value(end_inst, q_code)
-                push_row(base, q_code, py['label'], s_val, e_val,
+                push_row(base, q_code, py['label'],
+                        get_value(start_inst, q_code), get_value(end_inst, q_code),
+                        start_nums[q_code], end_nums[q_code],
                         start_date, end_date, start_inst, end_inst, eligible_bool)
 
             # 2) TOTAL rollup
-            total_start = sum_numeric([get_value(start_inst, q) for q in treatment_questions])
-            total_end = sum_numeric([get_value(end_inst, q) for q in treatment_questions])
+            total_start = sum_numeric(start_nums.values())
+            total_end = sum_numeric(end_nums.values())
             push_row(base, '__TOTAL__', py['label'], total_start, total_end,
+                    total_start if total_start != '' else None,
+                    total_end if total_end != '' else None,
                     start_date, end_date, start_inst, end_inst, eligible_bool)
 
-            # 3) Custom category rollups
+            # 3) Custom category rollups (categories may name questions outside this survey)
             for cat_name, q_list in custom_cats.items():
-                cat_start = sum_numeric([get_value(start_inst, q) for q in q_list])
-                cat_end = sum_numeric([get_value(end_inst, q) for q in q_list])
+                cat_start = sum_numeric([start_nums[q] if q in start_nums else get_number(start_inst, q)
+                                         for q in q_list])
+                cat_end = sum_numeric([end_nums[q] if q in end_nums else get_number(end_inst, q)
+                                       for q in q_list])
                 push_row(base, f"__CAT__:{cat_name}", py['label'], cat_start, cat_end,
+                        cat_start if cat_start != '' else None,
+                        cat_end if cat_end != '' else None,
                         start_date, end_date, start_inst, end_inst, eligible_bool)
 
     print(f"  Pivoted to long format: {len(out)-1} rows")
@@ -937,7 +1070,7 @@ def pivot_assessment_data(survey_code, question_codes, data_frame):
         q_code = row[col['QuestionCode']]
         value = row[col['Value']]
 
-        key = f"{patient_id}|{treatment_date}"
+        key = (patient_id, treatment_date)
 
         if key not in grouped_data:
             grouped_data[key] = {
@@ -954,25 +1087,14 @@ def pivot_assessment_data(survey_code, question_codes, data_frame):
     output_headers = ['PatientID', 'FirstName', 'LastName', 'TreatmentDate'] + question_codes
     output_data = [output_headers]
 
-    # Sort by PatientID and TreatmentDate
-    sorted_keys = sorted(grouped_data.keys(), key=lambda k: (
-        grouped_data[k]['patientID'],
-        grouped_data[k]['treatmentDate']
-    ))
-
-    for key in sorted_keys:
-        record = grouped_data[key]
-        row = [
-            record['patientID'],
-            record['firstName'],
-            record['lastName'],
-            record['treatmentDate']
-        ]
+    # Sort by PatientID and TreatmentDate (the key tuple)
+    sorted_keys = sorted(grouped_data)
 
-        for q in question_codes:
-            row.append(record['questions'].get(q, ''))
-
-        output_data.append(row)
+    output_data.extend(
+        [record['patientID'], record['firstName'], record['lastName'], record['treatmentDate']]
+        + [record['questions'].get(q, '') for q in question_codes]
+        for record in map(grouped_data.get, sorted_keys)
+    )
 
     print(f"  Pivoted {len(output_data)-1} rows")
     return output_data
@@ -1016,8 +1138,9 @@ def attendance_frame(treatment_thread, client_summary):
 
         # Parse TreatmentDT into separate date and time
         date_obj = parse_date_flexible(row[cs_col['TreatmentDT']])
-        date_str = date_obj.strftime('%-m/%-d/%Y') if platform.system() != 'Windows' else date_obj.strftime('%#m/%#d/%Y')
-        time_str = date_obj.strftime('%-I:%M %p') if platform.system() != 'Windows' else date_obj.strftime('%#I:%M %p')
+        # Built directly rather than with strftime, whose unpadded flags differ per platform
+        date_str = f"{date_obj.month}/{date_obj.day}/{date_obj.year}"
+        time_str = f"{date_obj.hour % 12 or 12}:{date_obj.minute:02d} {'AM' if date_obj.hour < 12 else 'PM'}"
 
         rows.append([
             row[cs_col['PatientID']],   # ClientID
@@ -1218,75 +1341,102 @@ def resident_info_frame(treatment_thread, client_info_map=None):
 
 def main():
     """Main data cleaning pipeline"""
+    # The client info scraper reports through logging
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
     print("="*60)
     print("Starting data cleaning pipeline...")
     print("="*60)
 
-    # Get Google Sheets client
+    # Get Google Sheets client and open the spreadsheet once for every read and write
     client = get_sheets_client()
+    spreadsheet = client.open_by_key(SHEET_ID)
 
     # Read input data
-    daily_summary = read_sheet_data(client, SHEET_ID, 'client_summary_export')
-    treatment_thread = read_sheet_data(client, SHEET_ID, 'treatment_thread_export')
-    assess_dict = read_sheet_data(client, SHEET_ID, 'assesment_dictionary')
-
-    # Build mappings
-    survey_mapping = get_survey_code_name_mapping(assess_dict)
-    value_cleaning_map = get_value_cleaning_mapping(assess_dict)
-    name_map = get_patient_name_mapping(treatment_thread)
-    unique_pairs = get_unique_treatment_question_pairs(assess_dict)
-
-    # Create skeleton
-    skeleton = create_skeleton(daily_summary, unique_pairs)
-    with_codes = generate_instance_codes(skeleton)
-
-    # Process treatment thread
-    processed_tt = process_treatment_thread_export(
-        treatment_thread, survey_mapping, value_cleaning_map
-    )
-
-    # Join and fill forward
-    joined_data = join_skeleton_with_responses(with_codes, processed_tt)
-    filled_data = fill_forward_values(joined_data)
-
-    # Stage final assessment frame
-    column_order = [
-        'QuestionTreatmentInstanceCode', 'TreatmentInstanceCode', 'PatientID',
-        'FirstName', 'LastName', 'TreatmentCode', 'SurveyName', 'TreatmentDate',
-        'QuestionCode', 'Value', 'IsImputed'
-    ]
-    final_data = stage_data(filled_data, name_map, column_order)
+    daily_summary, treatment_thread, assess_dict = read_sheets_data(
+        spreadsheet, ['client_summary_export', 'treatment_thread_export', 'assesment_dictionary'])
 
-    # Build client date frame
-    client_date_frame = build_client_date_frame_distinct(final_data)
-
-    # Generate output frames
-    wide_data = pivot_assessment_data(SS_SURVEY_CODE, SS_QUESTION_CODES, final_data)
-    long_with_aggs = pivot_client_date_frame_to_long_with_aggregations(
-        client_date_frame, final_data, AGGREGATION_CONFIG
-    )
-
-    # Build attendance frame
-    attendance = attendance_frame(treatment_thread, daily_summary)
-
-    # Scrape client contact info from ReliaTrax
+    # Scrape client contact info from ReliaTrax in the background: it only needs the raw
+    # treatment thread and waits on the network, so it runs while the frames are built
     print("\n" + "="*60)
-    print("Scraping client contact information...")
+    print("Scraping client contact information in the background...")
     print("="*60)
-    client_info_map = scrape_all_clients(treatment_thread)
-
-    # Build resident info frame (joined with scraped contact info)
-    resident_info = resident_info_frame(treatment_thread, client_info_map)
+    cancel_scrape = threading.Event()
+    scrape_executor = ThreadPoolExecutor(max_workers=1)
+    client_info_future = scrape_executor.submit(scrape_all_clients, treatment_thread, cancel_scrape)
+    try:
+        # Build mappings
+        survey_mapping = get_survey_code_name_mapping(assess_dict)
+        value_cleaning_map = get_value_cleaning_mapping(assess_dict)
+        name_map = get_patient_name_mapping(treatment_thread)
+        unique_pairs = get_unique_treatment_question_pairs(assess_dict)
+
+        # Create skeleton
+        skeleton = create_skeleton(daily_summary, unique_pairs)
+        with_codes = generate_instance_codes(skeleton)
+        # Each stage builds new rows, so drop intermediates as soon as the next stage has them
+        # to keep only ~two copies of the assessment rows alive at a time
+        del skeleton
+
+        # Process treatment thread
+        processed_tt = process_treatment_thread_export(
+            treatment_thread, survey_mapping, value_cleaning_map
+        )
+
+        # Join and fill forward
+        joined_data = join_skeleton_with_responses(with_codes, processed_tt)
+        del with_codes, processed_tt
+        filled_data = fill_forward_values(joined_data)
+        del joined_data
+
+        # Stage final assessment frame
+        column_order = [
+            'QuestionTreatmentInstanceCode', 'TreatmentInstanceCode', 'PatientID',
+            'FirstName', 'LastName', 'TreatmentCode', 'SurveyName', 'TreatmentDate',
+            'QuestionCode', 'Value', 'IsImputed'
+        ]
+        final_data = stage_data(filled_data, name_map, column_order)
+        del filled_data
+
+        # Build client date frame
+        client_date_frame = build_client_date_frame_distinct(final_data)
+
+        # Generate output frames
+        wide_data = pivot_assessment_data(SS_SURVEY_CODE, SS_QUESTION_CODES, final_data)
+        long_with_aggs = pivot_client_date_frame_to_long_with_aggregations(
+            client_date_frame, final_data, AGGREGATION_CONFIG,
+            skip_empty_program_years=os.environ.get("WEFORTIFY_SKIP_EMPTY_PROGRAM_YEARS") == "1"
+        )
+
+        # Build attendance frame
+        attendance = attendance_frame(treatment_thread, daily_summary)
+
+        # Wait for the client contact info scrape started above
+        client_info_map = client_info_future.result()
+
+        # Build resident info frame (joined with scraped contact info)
+        resident_info = resident_info_frame(treatment_thread, client_info_map)
+    except BaseException:
+        # Stop the scrape after its in-flight requests instead of letting the failed run
+        # wait for every remaining client before it can exit
+        cancel_scrape.set()
+        raise
+    finally:
+        scrape_executor.shutdown(wait=True)
 
     # Write output sheets
     print("\n" + "="*60)
     print("Writing output sheets...")
     print("="*60)
-    write_sheet_data(client, SHEET_ID, 'long_frame', final_data)
-    write_sheet_data(client, SHEET_ID, 'wide_frame', wide_data)
-    write_sheet_data(client, SHEET_ID, 'yoy_frame', long_with_aggs)
-    write_sheet_data(client, SHEET_ID, 'attendance_frame', attendance)
-    write_sheet_data(client, SHEET_ID, 'resident_info_frame', resident_info)
+    # Queue every frame and send them together rather than one round trip per sheet
+    batch = new_sheet_write_batch(spreadsheet)
+    write_sheet_data(client, SHEET_ID, 'long_frame', final_data, batch)
+    write_sheet_data(client, SHEET_ID, 'wide_frame', wide_data, batch)
+    write_sheet_data(client, SHEET_ID, 'yoy_frame', long_with_aggs, batch)
+    write_sheet_data(client, SHEET_ID, 'attendance_frame', attendance, batch)
+    write_sheet_data(client, SHEET_ID, 'resident_info_frame', resident_info, batch)
+    flush_sheet_writes(batch)
+    print("  ✓ All sheets written successfully")
 
     print("\n" + "="*60)
     print("✓ Data cleaning pipeline completed successfully!")
@@ -7,6 +7,10 @@ from datetime import date
 import pandas as pd
 from data_cleaner import get_sheets_client, read_sheet_data, write_sheet_data
 
+# Filtered/derived frames share data with their source until written to, so the
+# metric builders below don't need defensive copies
+pd.set_option("mode.copy_on_write", True)
+
 REPORTING_START = pd.Timestamp("2026-01-05")  # first Monday
 
 
@@ -57,7 +61,7 @@ def build_reporting_frame(nav_assignment_df, resident_info_df):
         nav_assignment_df[col] = pd.to_datetime(nav_assignment_df[col], errors="coerce")
 
     # Parse moveout-date in resident_info_df and keep only what we need
-    resident_info_df = resident_info_df[["ClientID", "moveout-date"]].copy()
+    resident_info_df = resident_info_df[["ClientID", "moveout-date"]]
     resident_info_df["moveout-date"] = pd.to_datetime(resident_info_df["moveout-date"], errors="coerce")
 
     # Join to get moveout-date onto nav assignments
@@ -209,7 +213,7 @@ def _build_survey_lookup(treatment_thread_df, codes):
     filtered = treatment_thread_df[
         (treatment_thread_df["Document"] == "Navigator Weekly Survey")
         & (treatment_thread_df["Code"].isin(codes))
-    ].copy()
+    ]
 
     filtered["Date"] = pd.to_datetime(filtered["Date"], errors="coerce")
     filtered = filtered.dropna(subset=["Date"])
@@ -446,8 +450,7 @@ def add_one_on_one_metric(reporting_df, attendance_df):
     one-on-ones prior to the end of the reporting week. "No" if 2 or more
     ABSENCE values. "No Data Provided" if no attendance records exist.
     """
-    att = attendance_df.copy()
-    att = att[att["Code"] == "Individual Case Management"]
+    att = attendance_df[attendance_df["Code"] == "Individual Case Management"]
     att["Date"] = pd.to_datetime(att["Date"], errors="coerce")
     att = att.dropna(subset=["Date"])
     att["attendee_status"] = att["attendee_status"].str.strip()
@@ -502,8 +505,7 @@ def add_ra_compliant_metric(reporting_df, attendance_df):
     meetings attended is no more than 2 fewer than their months in the village
     (e.g. 8 months → need at least 6 meetings).
     """
-    att = attendance_df.copy()
-    att = att[att["Code"] == "Resident Association Meeting"]
+    att = attendance_df[attendance_df["Code"] == "Resident Association Meeting"]
     att["Date"] = pd.to_datetime(att["Date"], errors="coerce")
     att = att.dropna(subset=["Date"])
     att["attendee_status"] = att["attendee_status"].str.strip()
@@ -647,7 +649,7 @@ def export_reporting_frame(reporting_df):
 
     # Convert DataFrame to list-of-lists with header row
     # Replace NaT/NaN with empty string for clean export
-    export_df = reporting_df.copy()
+    export_df = reporting_df.copy(deep=False)
     export_df["reporting_week_start"] = export_df["reporting_week_start"].dt.strftime("%m/%d/%Y")
     export_df["moveInDate"] = export_df["moveInDate"].dt.strftime("%m/%d/%Y")
     export_df["NavigatorCode"] = "'" + export_df["NavigatorCode"].astype(str)
@@ -661,7 +663,7 @@ def export_navigator_summary(navigator_summary_df):
     """Export the navigator summary DataFrame to the Navigator Assignment Google Sheet."""
     client = get_sheets_client()
 
-    export_df = navigator_summary_df.copy()
+    export_df = navigator_summary_df.copy(deep=False)
     export_df["reporting_week_start"] = export_df["reporting_week_start"].dt.strftime("%m/%d/%Y")
     export_df["NavigatorCode"] = "'" + export_df["NavigatorCode"].astype(str)
     export_df = export_df.fillna("")
@@ -1,86 +1,139 @@
 """Treatment Thread Export Scraper"""
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+import csv
+import html
 import os
-import time
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from utils import (
-    setup_driver,
-    login_to_reliatrax,
+    get_authenticated_driver,
+    get_authenticated_session,
+    is_login_page,
+    open_worksheet,
+    parse_form,
     write_to_sheets,
+    append_rows_to_sheets,
     wait_for_csv_download,
-    read_csv_file,
+    iter_csv_chunks,
     clear_old_csv_files
 )
 
+EXPORT_URL = "https://wefortify.reliatrax.net/TreatmentThread.aspx/ThreadExport"
+
+# Columns data_cleaner reads from the export; an HTTP reply whose header row lacks any of
+# them isn't the CSV Row View export, so the browser path is used instead
+EXPORT_REQUIRED_COLUMNS = ('ClientID', 'FirstName', 'LastName', 'Folder', 'Document', 'Code', 'Date', 'Time', 'Value')
+
+# Fills the export form (folder, start date, end date), ticks "Include All Values" if
+# needed and clicks CSV Row View; fields get the same input/change events as typing
+SUBMIT_EXPORT_FORM_SCRIPT = """
+const [folder, startDate, endDate] = arguments;
+const setField = (id, value) => {
+    const field = document.getElementById(id);
+    field.value = value;
+    field.dispatchEvent(new Event('input', {bubbles: true}));
+    field.dispatchEvent(new Event('change', {bubbles: true}));
+};
+setField('folderID', folder);
+setField('startDate', startDate);
+setField('endDate', endDate);
+const includeAll = document.getElementById('includeAllValues');
+if (!includeAll.checked) includeAll.click();
+document.getElementById('btCsvRowDownload').click();
+"""
+
+
+def export_treatment_data_http(session, start_date, end_date, download_dir="/tmp"):
+    """Submit the export form over plain HTTP and return the saved CSV's path
+
+    Posts the same fields the browser form sends (hidden ASP.NET state included)
+    with a logged-in requests.Session, so no browser has to start.
+
+    Args:
+        session: Logged-in requests.Session (see get_or_create_session)
+        start_date: First date to export, MM/DD/YYYY
+        end_date: Last date to export, MM/DD/YYYY
+        download_dir: Directory the CSV is saved to before parsing
+    """
+    print("Loading Treatment Thread Export form over HTTP...")
+    response = session.get(EXPORT_URL, timeout=30)
+    response.raise_for_status()
+    if is_login_page(response.url):
+        raise Exception("HTTP session is not logged in")
+
+    post_url, payload = parse_form(response.text, response.url, r'id="btCsvRowDownload"')
+    if payload is None:
+        raise Exception("Export form not found on Treatment Thread Export page")
+
+    payload['folderID'] = "1"  # "All Folders"
+    payload['startDate'] = start_date
+    payload['endDate'] = end_date
+
+    # Tick "Include All Values" with whatever value the checkbox itself submits ("on" if it has none)
+    include_all = re.search(r'<input\b[^>]*\b(?:id|name)="includeAllValues"[^>]*>', response.text, re.I)
+    if include_all is None:
+        raise Exception("Include All Values checkbox not found on Treatment Thread Export page")
+    include_all_name = re.search(r'\bname="([^"]*)"', include_all.group(0), re.I)
+    include_all_value = re.search(r'\bvalue="([^"]*)"', include_all.group(0), re.I)
+    payload[html.unescape(include_all_name.group(1)) if include_all_name else 'includeAllValues'] = (
+        html.unescape(include_all_value.group(1)) if include_all_value else 'on'
+    )
+
+    # Submit as the CSV Row View button, if the server tells its buttons apart by name
+    button = re.search(r'<(?:button|input)\b[^>]*\bid="btCsvRowDownload"[^>]*>', response.text, re.I)
+    button_name = re.search(r'\bname="([^"]*)"', button.group(0), re.I) if button else None
+    if button_name:
+        button_value = re.search(r'\bvalue="([^"]*)"', button.group(0), re.I)
+        payload[html.unescape(button_name.group(1))] = html.unescape(button_value.group(1)) if button_value else ''
+
+    print("Requesting CSV export...")
+    response = session.post(post_url, data=payload, timeout=300)
+    response.raise_for_status()
+    # An HTML reply is the form (or login page) again rather than the export
+    if 'html' in response.headers.get('Content-Type', '').lower():
+        raise Exception("Export request returned a page instead of a CSV")
+
+    # Check the header row before anything touches the disk or the sheet
+    header_line = response.content.split(b'\n', 1)[0].decode('utf-8-sig', errors='replace')
+    headers = next(csv.reader([header_line]), [])
+    missing = [column for column in EXPORT_REQUIRED_COLUMNS if column not in headers]
+    if missing:
+        raise Exception(f"Export response is missing expected columns: {', '.join(missing)}")
+
+    clear_old_csv_files(download_dir)
+    file_path = os.path.join(download_dir, "treatment_thread_export.csv")
+    with open(file_path, "wb") as f:
+        f.write(response.content)
+    print(f"Saved CSV export ({len(response.content)} bytes)")
+
+    return file_path
+
 
 def export_treatment_data(driver, start_date, end_date):
-    """Navigate to export page and trigger CSV download"""
+    """Navigate to export page, trigger the CSV download and return the file's path"""
     print("Navigating to Treatment Thread Export page...")
-    driver.get("https://wefortify.reliatrax.net/TreatmentThread.aspx/ThreadExport")
+    driver.get(EXPORT_URL)
 
     try:
         wait = WebDriverWait(driver, 30)
 
-        print("Waiting for export page to load...")
-        time.sleep(2)
-
-        # Select "All Folders" from the dropdown
-        print("Looking for folder dropdown...")
-        folder_dropdown = wait.until(EC.presence_of_element_located((By.ID, "folderID")))
-        print("Found folder dropdown, selecting 'All Folders'...")
-
-        select = Select(folder_dropdown)
-        select.select_by_value("1")  # Value "1" corresponds to "All Folders"
-        print("Selected 'All Folders'")
-        time.sleep(1)
-
-        # Set start date
-        print(f"Setting start date to {start_date}...")
-        start_date_field = wait.until(EC.presence_of_element_located((By.ID, "startDate")))
-        start_date_field.clear()
-        start_date_field.send_keys(start_date)
-        print("Start date set successfully")
-        time.sleep(0.5)
-
-        # Set end date
-        print(f"Setting end date to {end_date}...")
-        end_date_field = driver.find_element(By.ID, "endDate")
-        end_date_field.clear()
-        end_date_field.send_keys(end_date)
-        print("End date set successfully")
-        time.sleep(0.5)
-
-        # Find the CSV Row View button
-        print("Looking for CSV Row View button...")
-        csv_button = wait.until(EC.presence_of_element_located((By.ID, "btCsvRowDownload")))
+        # The CSV button renders last, so once it's clickable the whole form is ready
+        print("Waiting for export form...")
+        wait.until(EC.element_to_be_clickable((By.ID, "btCsvRowDownload")))
         print("Found CSV Row View button!")
 
-        # Find and check the "Include All Values" checkbox
-        print("Looking for 'Include All Values' checkbox...")
-        include_all_checkbox = driver.find_element(By.ID, "includeAllValues")
-
-        if not include_all_checkbox.is_selected():
-            print("Checking 'Include All Values' checkbox...")
-            include_all_checkbox.click()
-            time.sleep(1)
-        else:
-            print("Checkbox already checked")
-
-        # Clear old CSV files and trigger download
+        # Clear old CSV files, then fill the form and trigger the download in one round trip
         clear_old_csv_files()
 
-        print("Clicking CSV export button to download file...")
-        csv_button.click()
+        print(f"Selecting 'All Folders', {start_date} to {end_date}, 'Include All Values', and clicking CSV export...")
+        driver.execute_script(SUBMIT_EXPORT_FORM_SCRIPT, "1", start_date, end_date)  # "1" = "All Folders"
 
         # Wait for file to download
-        downloaded_file = wait_for_csv_download()
-
-        # Read the CSV file
-        csv_data = read_csv_file(downloaded_file)
-        return csv_data
+        return wait_for_csv_download()
 
     except Exception as e:
         print(f"Error during export: {e}")
@@ -96,32 +149,48 @@ def main():
     SHEET_ID = "196rg3YfpssRLsdFig4yN9G3U9NrQFPEeROnr1oSNGCA"
     WORKSHEET_NAME = "treatment_thread_export"  # UPDATE THIS to your tab name
 
-    driver = None
-
     try:
-        # Get credentials from environment
-        username = os.environ['RELIATRAX_USERNAME']
-        password = os.environ['RELIATRAX_PASSWORD']
-
-        # Setup driver
-        driver = setup_driver()
-
-        # Login
-        login_to_reliatrax(driver, username, password)
-
         # Get date range: always from 01/01/2020 to today
         end_date_str = datetime.now().strftime("%m/%d/%Y")
         start_date_str = "01/01/2020"
 
         print(f"Exporting data from {start_date_str} to {end_date_str}")
 
-        # Export data
-        data = export_treatment_data(driver, start_date_str, end_date_str)
-
-        if data["rows"]:
-            # Write to Google Sheets - specify worksheet name to write to specific tab
-            write_to_sheets(data, SHEET_ID, worksheet_name=WORKSHEET_NAME, clear_first=True)
-            print("Export completed successfully!")
+        # Authorize with Google and open the worksheet in the background; it doesn't
+        # depend on the export, so those round trips overlap the download
+        sheet_executor = ThreadPoolExecutor(max_workers=1)
+        sheet_future = sheet_executor.submit(open_worksheet, SHEET_ID, WORKSHEET_NAME)
+        sheet_executor.shutdown(wait=False)
+
+        # Export data over plain HTTP; fall back to driving the form in a browser
+        # (or go straight to the browser with USE_SELENIUM=1)
+        csv_file = None
+        if os.environ.get("USE_SELENIUM") != "1":
+            try:
+                csv_file = export_treatment_data_http(get_authenticated_session(), start_date_str, end_date_str)
+            except Exception as e:
+                print(f"HTTP export failed ({e}), falling back to the browser")
+        if csv_file is None:
+            # Logged-in browser for the RELIATRAX_* account, shared with any other scraper in this process
+            driver = get_authenticated_driver()
+            csv_file = export_treatment_data(driver, start_date_str, end_date_str)
+
+        # Stream the CSV into the sheet a chunk at a time: the first chunk clears the sheet
+        # and writes headers, later chunks are appended
+        sheet = None
+        total_rows = 0
+        for headers, rows in iter_csv_chunks(csv_file):
+            if sheet is None:
+                # Write to Google Sheets - specify worksheet name to write to specific tab
+                sheet, timestamp = write_to_sheets({"headers": headers, "rows": rows}, SHEET_ID,
+                                                   worksheet_name=WORKSHEET_NAME, clear_first=True,
+                                                   sheet=sheet_future.result())
+            else:
+                append_rows_to_sheets(rows, sheet, timestamp)
+            total_rows += len(rows)
+
+        if total_rows:
+            print(f"Export completed successfully! ({total_rows} rows)")
         else:
             print("No data to export.")
 
@@ -129,11 +198,6 @@ def main():
         print(f"Error in main execution: {e}")
         raise
 
-    finally:
-        if driver:
-            driver.quit()
-            print("Browser closed.")
-
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,56 @@
+import unittest
+
+from client_info_scraper import scrape_client_info
+
+
+CLIENT_PAGE = """
+<div id="ClientHeaderBox"><span class="bold">Mijares, Aliyah (5/1/2007) "Zinx"</span></div>
+Phone Number: <strong>719-214-5339</strong>
+Email: <strong>old-address@example.com</strong>
+Email: <strong><a class="link" href="mailto:zinxmijares@gmail.com">zinxmijares@gmail.com</a></strong>
+<span>Assigned Office:</span>
+<strong>Working Fusion</strong>
+"""
+
+
+class FakeResponse:
+    def __init__(self, text, url):
+        self.text = text
+        self.url = url
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, text):
+        self.text = text
+
+    def get(self, url, timeout=None):
+        return FakeResponse(self.text, url)
+
+
+class ScrapeClientInfoTest(unittest.TestCase):
+    def test_linked_email_wins_over_earlier_plain_email(self):
+        result = scrape_client_info(FakeSession(CLIENT_PAGE), '123')
+
+        self.assertNotIn('Error', result)
+        self.assertEqual(result['Email'], 'zinxmijares@gmail.com')
+        self.assertEqual(result['PhoneNumber'], '719-214-5339')
+        self.assertEqual(result['AssignedOffice'], 'Working Fusion')
+        self.assertEqual((result['LastName'], result['FirstName']), ('Mijares', 'Aliyah'))
+
+    def test_plain_email_used_when_no_linked_email(self):
+        page = '\n'.join(line for line in CLIENT_PAGE.splitlines() if 'mailto:' not in line)
+        result = scrape_client_info(FakeSession(page), '123')
+
+        self.assertEqual(result['Email'], 'old-address@example.com')
+
+    def test_page_without_name_is_an_error(self):
+        result = scrape_client_info(FakeSession('Phone Number: <strong>719-214-5339</strong>'), '123')
+
+        self.assertIn('Error', result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from datetime import datetime
+
+from data_cleaner import flush_sheet_writes, new_sheet_write_batch, write_sheet_data
+
+
+class FakeWorksheet:
+    def __init__(self, title, sheet_id, row_count):
+        self.title = title
+        self.id = sheet_id
+        self.row_count = row_count
+        self.col_count = 26
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets):
+        self.worksheets = {ws.title: ws for ws in worksheets}
+        self.calls = []
+
+    def worksheet(self, title):
+        return self.worksheets[title]
+
+    def batch_update(self, body):
+        self.calls.append(('batch_update', body['requests']))
+
+    def values_batch_update(self, body):
+        self.calls.append(('values_batch_update', body['data']))
+
+
+class WriteSheetDataTest(unittest.TestCase):
+    def test_clears_then_values_then_formats(self):
+        # The tab's grid is smaller than the new data, so the date format range only
+        # fits once the values have been written
+        spreadsheet = FakeSpreadsheet([FakeWorksheet('tab', 7, row_count=2)])
+        data = [['ClientID', 'Date']] + [[str(i), datetime(2024, 1, 1)] for i in range(5)]
+
+        batch = new_sheet_write_batch(spreadsheet)
+        write_sheet_data(None, None, 'tab', data, batch=batch)
+        flush_sheet_writes(batch)
+
+        self.assertEqual([name for name, _ in spreadsheet.calls],
+                         ['batch_update', 'values_batch_update', 'batch_update'])
+        clears, values, formats = (payload for _, payload in spreadsheet.calls)
+        self.assertEqual([list(request) for request in clears], [['updateCells']])
+        self.assertEqual(len(values[0]['values']), 6)
+        self.assertEqual([list(request) for request in formats], [['repeatCell']])
+        self.assertEqual(formats[0]['repeatCell']['range']['endRowIndex'], 6)
+
+    def test_flush_without_dates_sends_no_format_update(self):
+        spreadsheet = FakeSpreadsheet([FakeWorksheet('tab', 7, row_count=10)])
+
+        batch = new_sheet_write_batch(spreadsheet)
+        write_sheet_data(None, None, 'tab', [['ClientID', 'N'], ['1', 2]], batch=batch)
+        flush_sheet_writes(batch)
+
+        self.assertEqual([name for name, _ in spreadsheet.calls], ['batch_update', 'values_batch_update'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from utils import read_csv_file
+
+
+MULTILINE_CSV = 'ClientID,Note,Value\n1,"first line\nsecond line",5\n2,plain,6\n'
+
+
+class ArrowInvalid(ValueError):
+    pass
+
+
+class ReadCsvFileTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', encoding='utf-8', newline='') as f:
+            f.write(MULTILINE_CSV)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_quoted_multiline_cell_stays_one_row(self):
+        data = read_csv_file(self.path)
+
+        self.assertEqual(data['headers'], ['ClientID', 'Note', 'Value'])
+        self.assertEqual(data['rows'], [['1', 'first line\nsecond line', '5'], ['2', 'plain', '6']])
+
+    def test_arrow_parse_error_falls_back_to_default_parser(self):
+        real_read_csv = pd.read_csv
+
+        def read_csv(path, engine=None, **options):
+            if engine == 'pyarrow':
+                raise pd.errors.ParserError('CSV parse error') from ArrowInvalid('newline in quoted value')
+            return real_read_csv(path, **options)
+
+        fake_pyarrow = types.SimpleNamespace(ArrowInvalid=ArrowInvalid)
+        with mock.patch.dict(sys.modules, {'pyarrow': fake_pyarrow}), \
+                mock.patch.object(pd, 'read_csv', side_effect=read_csv) as patched:
+            data = read_csv_file(self.path)
+
+        self.assertEqual([call.kwargs.get('engine') for call in patched.call_args_list], ['pyarrow', None])
+        self.assertEqual(data['rows'][0], ['1', 'first line\nsecond line', '5'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,28 +3,119 @@ from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
+import atexit
+import hashlib
 import json
 import os
 from datetime import datetime
+from functools import lru_cache
 
 
-def setup_driver():
-    """Set up headless Chrome driver for GitHub Actions"""
+# Logged-in drivers shared by all scrapers running in this process, keyed by session hash
+_driver_pool = {}
+# Logged-in HTTP sessions, likewise
+_session_pool = {}
+
+# Auth cookies of HTTP sessions, saved so later runs (and the other scrapers' processes)
+# can skip logging in while the server-side session is still valid
+DEFAULT_COOKIE_FILE = "/tmp/wefortify-cookies.json"
+
+# Persistent Chrome profiles (HTTP cache, session cookies) live under this directory.
+# Each running Chrome needs its own profile, so drivers claim numbered slots under it.
+DEFAULT_PROFILE_DIR = "/tmp/wefortify-chrome"
+# Open lock files for the profile slots this process holds
+_profile_locks = []
+
+LOGIN_URL = "https://wefortify.reliatrax.net/Account.aspx/Login"
+
+# A page that requires login; ReliaTrax redirects it to the login form when the session is gone
+SESSION_CHECK_URL = "https://wefortify.reliatrax.net/Report.aspx/ClientDailyActivity"
+
+# Requests the headless browser refuses outright: images, video, web fonts and analytics
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*/analytics/*",
+]
+
+# Sets each of arguments[0]'s fields to the matching value in arguments[1], as if typed
+FILL_FIELDS_SCRIPT = """
+arguments[0].forEach((field, i) => {
+    field.value = arguments[1][i];
+    field.dispatchEvent(new Event('input', {bubbles: true}));
+    field.dispatchEvent(new Event('change', {bubbles: true}));
+});
+"""
+
+# Sent by both the headless browser and plain HTTP sessions
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/148.0.0.0 Safari/537.36'
+
+
+def _claim_profile_dir():
+    """Return a persistent Chrome profile directory no other running driver is using
+
+    Slots are locked with flock for the life of this process, so parallel workers
+    (and reruns) each get a warm profile without two Chromes sharing one. Without
+    fcntl (Windows) each process gets a fresh temporary profile instead.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        import tempfile
+        return tempfile.mkdtemp(prefix="wefortify-chrome-")
+
+    base_dir = os.environ.get("CHROME_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+    os.makedirs(base_dir, exist_ok=True)
+
+    slot = 0
+    while True:
+        lock_file = open(os.path.join(base_dir, f"profile-{slot}.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            slot += 1
+            continue
+
+        _profile_locks.append(lock_file)
+        return os.path.join(base_dir, f"profile-{slot}")
+
+
+def setup_driver(download_dir="/tmp"):
+    """Set up headless Chrome driver for GitHub Actions
+
+    Args:
+        download_dir: Directory Chrome saves downloaded files to
+    """
     chrome_options = Options()
     chrome_options.add_argument('--headless=new')
+    # Reuse a warm profile so cached scripts and a still-valid session survive between runs
+    chrome_options.add_argument(f'--user-data-dir={_claim_profile_dir()}')
     chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
-    chrome_options.add_argument('--disable-gpu')
+    # The Actions runner's /dev/shm is large enough for Chrome's shared memory, so it
+    # stays there rather than falling back to /tmp (--disable-dev-shm-usage)
     chrome_options.add_argument('--window-size=1920,1080')
     chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-    chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/148.0.0.0 Safari/537.36')
+    chrome_options.add_argument(f'--user-agent={USER_AGENT}')
+    # No extension loading or background update/metrics traffic competing with page loads
+    chrome_options.add_argument('--disable-extensions')
+    chrome_options.add_argument('--disable-background-networking')
+    chrome_options.add_argument('--disable-features=Translate,MediaRouter,OptimizationHints')
 
     chrome_options.add_argument('--enable-javascript')
+    # Scrapers only read text, so don't fetch images
+    chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+
+    # Return from driver.get() at DOMContentLoaded; callers wait for the elements they need
+    chrome_options.page_load_strategy = 'eager'
 
     prefs = {
-        "download.default_directory": "/tmp",
+        "download.default_directory": download_dir,
         "download.prompt_for_download": False,
         "download.directory_upgrade": True,
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
     }
     chrome_options.add_experimental_option("prefs", prefs)
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
@@ -37,6 +128,10 @@ def setup_driver():
         "source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
     })
 
+    # Don't download resources the scrapers never read (stylesheets stay: waits check visibility)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
     return driver
 
 
@@ -46,54 +141,412 @@ def login_to_reliatrax(driver, username, password):
     from selenium.webdriver.support.ui import WebDriverWait
     from selenium.webdriver.support import expected_conditions as EC
     from selenium.common.exceptions import TimeoutException
-    import time
 
-    print("Navigating to login page...")
-    driver.get("https://wefortify.reliatrax.net/Account.aspx/Login")
+    # A persistent profile may still hold a valid session; protected pages only redirect
+    # to the login form when it has expired, so that check doubles as loading the form
+    print("Checking for an existing session...")
+    driver.get(SESSION_CHECK_URL)
+    if not is_login_page(driver.current_url):
+        print("Already logged in, reusing saved session")
+        return
+
+    # Another run (or the HTTP session) may have logged in since this profile last did
+    account_key = _account_key(username, password)
+    if _restore_driver_cookies(driver, account_key):
+        return
 
     try:
         wait = WebDriverWait(driver, 20)
 
-        print("Waiting for page to load...")
-        time.sleep(2)
-
         print(f"Page title: {driver.title}")
         print(f"Current URL: {driver.current_url}")
 
         print("Looking for username field...")
         username_field = wait.until(
-            EC.presence_of_element_located((By.NAME, "username"))
+            EC.element_to_be_clickable((By.NAME, "username"))
         )
-        username_field.clear()
-        username_field.send_keys(username)
-        print("Username entered successfully")
 
         print("Looking for password field...")
         password_field = driver.find_element(By.NAME, "password")
-        password_field.clear()
-        password_field.send_keys(password)
-        print("Password entered successfully")
+
+        # Fill both fields in one round trip rather than clear + per-keystroke send_keys each;
+        # input/change events still fire for any script watching the form
+        driver.execute_script(FILL_FIELDS_SCRIPT, [username_field, password_field], [username, password])
+        print("Username and password entered successfully")
 
         print("Looking for login button...")
         login_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
         login_button.click()
         print("Login button clicked")
 
-        time.sleep(3)
+        # Wait for whichever comes first: leaving the login form, or the form page being
+        # replaced (a rejected login re-renders it) - so bad credentials fail right away
+        wait.until(EC.any_of(
+            lambda d: not is_login_page(d.current_url),
+            EC.staleness_of(login_button),
+        ))
+        if is_login_page(driver.current_url):
+            print("Login failed: still on the login page after submitting credentials")
+            _save_login_debug_files(driver)
+            raise Exception("Login failed: still on the login page after submitting credentials")
+
         print("Login successful!")
+        _save_driver_cookies(driver, account_key)
 
     except TimeoutException as e:
         print(f"Login failed with timeout: {e}")
-        print("Saving screenshot for debugging...")
-        driver.save_screenshot("/tmp/login_error.png")
-        print("Saving page source for debugging...")
-        with open("/tmp/page_source.html", "w", encoding="utf-8") as f:
-            f.write(driver.page_source)
+        _save_login_debug_files(driver)
         raise
 
 
+def _save_login_debug_files(driver):
+    print("Saving screenshot for debugging...")
+    driver.save_screenshot("/tmp/login_error.png")
+    print("Saving page source for debugging...")
+    with open("/tmp/page_source.html", "w", encoding="utf-8") as f:
+        f.write(driver.page_source)
+
+
+def is_login_page(url):
+    """True if ReliaTrax sent us (back) to the login form"""
+    return "/account.aspx/login" in url.lower()
+
+
+def parse_form(page_html, page_url, marker):
+    """Find the form whose body matches marker and return (post_url, payload)
+
+    The payload holds what the browser would submit: every named input with its
+    value (hidden fields such as anti-forgery tokens included), minus unchecked
+    boxes, plus the selected option of each <select>. Callers then fill in the
+    fields they care about.
+
+    Args:
+        page_html: HTML of the page holding the form
+        page_url: URL the page was served from (relative form actions resolve against it)
+        marker: Regex that only matches inside the wanted form
+    """
+    import html
+    import re
+    from urllib.parse import urljoin
+
+    form = next((m for m in re.finditer(r'<form\b([^>]*)>(.*?)</form>', page_html, re.S | re.I)
+                 if re.search(marker, m.group(2), re.I)), None)
+    if form is None:
+        return None, None
+
+    action = re.search(r'\baction="([^"]*)"', form.group(1), re.I)
+    post_url = urljoin(page_url, html.unescape(action.group(1))) if action and action.group(1) else page_url
+
+    payload = {}
+    for tag in re.findall(r'<input\b[^>]*>', form.group(2), re.I):
+        name = re.search(r'\bname="([^"]*)"', tag, re.I)
+        if not name:
+            continue
+        # Unchecked boxes aren't submitted by the browser either
+        if re.search(r'\btype="(?:checkbox|radio)"', tag, re.I) and not re.search(r'\bchecked\b', tag, re.I):
+            continue
+        # Nor are buttons other than the one clicked
+        if re.search(r'\btype="(?:submit|button|image|reset)"', tag, re.I):
+            continue
+        value = re.search(r'\bvalue="([^"]*)"', tag, re.I)
+        payload[html.unescape(name.group(1))] = html.unescape(value.group(1)) if value else ''
+
+    for select in re.finditer(r'<select\b([^>]*)>(.*?)</select>', form.group(2), re.S | re.I):
+        name = re.search(r'\bname="([^"]*)"', select.group(1), re.I)
+        if not name:
+            continue
+        options = re.findall(r'<option\b([^>]*)>', select.group(2), re.I)
+        chosen = next((o for o in options if re.search(r'\bselected\b', o, re.I)), options[0] if options else None)
+        value = re.search(r'\bvalue="([^"]*)"', chosen, re.I) if chosen else None
+        payload[html.unescape(name.group(1))] = html.unescape(value.group(1)) if value else ''
+
+    return post_url, payload
+
+
+def login_to_reliatrax_requests(session, username, password):
+    """Log into ReliaTrax over plain HTTP, leaving the auth cookies on session
+
+    Submits the login form the same way the browser does, including its hidden
+    fields (e.g. anti-forgery tokens), so pages that only need their HTML can be
+    fetched without a browser.
+
+    Args:
+        session: requests.Session to authenticate
+        username: ReliaTrax username
+        password: ReliaTrax password
+    """
+    print("Logging in over HTTP...")
+    response = session.get(LOGIN_URL, timeout=20)
+    response.raise_for_status()
+
+    # The login form is the one with the password field
+    post_url, payload = parse_form(response.text, response.url, r'name="password"')
+    if payload is None:
+        raise Exception("Login form not found on login page")
+    payload['username'] = username
+    payload['password'] = password
+
+    response = session.post(post_url, data=payload, timeout=20)
+    response.raise_for_status()
+
+    if is_login_page(response.url):
+        raise Exception("Login failed: still on the login page after submitting credentials")
+
+    print("Login successful!")
+    return session
+
+
+def get_or_create_driver(username, password, download_dir="/tmp"):
+    """Return a logged-in driver, reusing the pooled one for these credentials if present
+
+    The first call starts Chrome and logs in; later calls in the same process get the
+    same authenticated session instead of paying for another browser start and login.
+    A pooled driver that no longer responds is replaced with a fresh, logged-in one.
+    Pooled drivers are quit when the interpreter exits (see quit_all_drivers).
+
+    Args:
+        username: ReliaTrax username
+        password: ReliaTrax password
+        download_dir: Directory Chrome saves downloaded files to
+    """
+    from selenium.common.exceptions import WebDriverException
+
+    session_key = hashlib.sha256(f"{username}\0{password}\0{download_dir}".encode()).hexdigest()
+
+    driver = _driver_pool.get(session_key)
+    if driver is not None:
+        # A crashed or timed-out browser stays in the pool; replace it rather than hand it out
+        try:
+            driver.current_url
+        except WebDriverException as e:
+            print(f"Pooled browser is unresponsive ({e.__class__.__name__}), starting a new one")
+            del _driver_pool[session_key]
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            driver = None
+
+    if driver is None:
+        driver = setup_driver(download_dir=download_dir)
+        try:
+            login_to_reliatrax(driver, username, password)
+        except Exception:
+            driver.quit()
+            raise
+        _driver_pool[session_key] = driver
+    else:
+        print("Reusing logged-in browser session")
+
+    return driver
+
+
+def quit_all_drivers():
+    """Quit every pooled driver"""
+    while _driver_pool:
+        _, driver = _driver_pool.popitem()
+        try:
+            driver.quit()
+            print("Browser closed.")
+        except Exception as e:
+            print(f"Error closing browser: {e}")
+
+
+def get_authenticated_driver(download_dir="/tmp"):
+    """Return the process's logged-in driver for the RELIATRAX_USERNAME/PASSWORD account
+
+    Convenience wrapper over get_or_create_driver for scrapers that take their
+    credentials from the environment, so every scraper run in one process shares
+    a single login.
+    """
+    return get_or_create_driver(
+        os.environ['RELIATRAX_USERNAME'], os.environ['RELIATRAX_PASSWORD'], download_dir=download_dir
+    )
+
+
+def get_or_create_session(username, password):
+    """Return a logged-in requests.Session, reusing the pooled one for these credentials
+
+    The HTTP counterpart of get_or_create_driver for pages that don't need a browser.
+    The session keeps its connection alive between requests and retries transient
+    GET failures (timeouts, 502/503/504) with backoff; the login POST is never replayed.
+    Its cookies are saved to RELIATRAX_COOKIE_FILE (default /tmp/wefortify-cookies.json),
+    so a later process, HTTP or browser, reuses the login while the server keeps it valid.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session_key = _account_key(username, password)
+
+    session = _session_pool.get(session_key)
+    if session is None:
+        session = requests.Session()
+        session.headers['User-Agent'] = USER_AGENT
+
+        # Callers issue one request at a time, so a single pooled connection is enough
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=retry))
+
+        if not _restore_session_cookies(session, session_key):
+            login_to_reliatrax_requests(session, username, password)
+            _save_session_cookies(session, session_key)
+        _session_pool[session_key] = session
+    else:
+        print("Reusing logged-in HTTP session")
+
+    return session
+
+
+def _cookie_file():
+    return os.environ.get("RELIATRAX_COOKIE_FILE", DEFAULT_COOKIE_FILE)
+
+
+def _account_key(username, password):
+    """Key saved cookies by account, so either login path can reuse the other's"""
+    return hashlib.sha256(f"{username}\0{password}".encode()).hexdigest()
+
+
+def _load_saved_cookies(account_key):
+    """Return the cookies saved for account_key (name/value/domain/path/expires/secure dicts)"""
+    try:
+        with open(_cookie_file(), encoding="utf-8") as f:
+            return json.load(f).get(account_key) or []
+    except (OSError, ValueError):
+        return []
+
+
+def _save_cookies(account_key, cookies):
+    """Save cookies under account_key, replacing what was saved for it before"""
+    cookie_file = _cookie_file()
+    try:
+        with open(cookie_file, encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        saved = {}
+    saved[account_key] = cookies
+
+    # Credentials-equivalent, so owner-only; written aside and renamed so concurrent
+    # workers never read a half-written file
+    tmp_file = f"{cookie_file}.{os.getpid()}.tmp"
+    try:
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(saved, f)
+        os.replace(tmp_file, cookie_file)
+    except OSError as e:
+        print(f"Could not save session cookies: {e}")
+
+
+def _restore_session_cookies(session, account_key):
+    """Load saved cookies for account_key onto session; True if they're still logged in"""
+    saved = _load_saved_cookies(account_key)
+    if not saved:
+        return False
+
+    for cookie in saved:
+        session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'],
+                            path=cookie['path'], expires=cookie['expires'], secure=cookie['secure'])
+
+    # Protected pages redirect to the login form once the server-side session is gone
+    print("Checking saved HTTP session...")
+    try:
+        response = session.get(SESSION_CHECK_URL, timeout=20)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"Saved session check failed ({e.__class__.__name__})")
+        session.cookies.clear()
+        return False
+    if is_login_page(response.url):
+        print("Saved session has expired")
+        session.cookies.clear()
+        return False
+
+    print("Already logged in, reusing saved HTTP session")
+    return True
+
+
+def _save_session_cookies(session, account_key):
+    """Save session's cookies under account_key for _restore_session_cookies"""
+    _save_cookies(account_key, [
+        {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path,
+         'expires': c.expires, 'secure': c.secure}
+        for c in session.cookies
+    ])
+
+
+def _restore_driver_cookies(driver, account_key):
+    """Load saved cookies for account_key into the browser; True if they're still logged in
+
+    The driver must already be on a ReliaTrax page, since cookies can only be
+    added for the current site.
+    """
+    import time
+
+    saved = [c for c in _load_saved_cookies(account_key)
+             if not c['expires'] or c['expires'] > time.time()]
+    if not saved:
+        return False
+
+    for cookie in saved:
+        # Left without a domain, each cookie is scoped to the current host
+        browser_cookie = {'name': cookie['name'], 'value': cookie['value'],
+                          'path': cookie['path'] or '/', 'secure': bool(cookie['secure'])}
+        if cookie['expires']:
+            browser_cookie['expiry'] = int(cookie['expires'])
+        try:
+            driver.add_cookie(browser_cookie)
+        except Exception as e:
+            print(f"Could not restore cookie {cookie['name']} ({e.__class__.__name__})")
+
+    print("Checking saved session cookies...")
+    driver.get(SESSION_CHECK_URL)
+    if is_login_page(driver.current_url):
+        print("Saved session has expired")
+        return False
+
+    print("Already logged in, reusing saved session cookies")
+    return True
+
+
+def _save_driver_cookies(driver, account_key):
+    """Save the browser's cookies under account_key for either login path to reuse"""
+    _save_cookies(account_key, [
+        {'name': c['name'], 'value': c['value'], 'domain': c.get('domain', ''),
+         'path': c.get('path', '/'), 'expires': c.get('expiry'), 'secure': c.get('secure', False)}
+        for c in driver.get_cookies()
+    ])
+
+
+def get_authenticated_session():
+    """Return the process's logged-in HTTP session for the RELIATRAX_USERNAME/PASSWORD account"""
+    return get_or_create_session(os.environ['RELIATRAX_USERNAME'], os.environ['RELIATRAX_PASSWORD'])
+
+
+def _clear_pools_after_fork():
+    _driver_pool.clear()
+    _session_pool.clear()
+    get_sheets_client.cache_clear()
+
+
+atexit.register(quit_all_drivers)
+# Forked workers must start their own browsers and connections rather than inherit
+# (and later quit or interleave on) the parent's
+if hasattr(os, 'register_at_fork'):  # Not on platforms without fork (Windows)
+    os.register_at_fork(after_in_child=_clear_pools_after_fork)
+
+
+@lru_cache(maxsize=1)
 def get_sheets_client():
-    """Setup and return Google Sheets client"""
+    """Setup and return Google Sheets client
+
+    Authorized once per process; later calls share the same client and its
+    keep-alive connection to the Sheets API.
+    """
+    import warnings
+    # oauth2client is deprecated but still what gspread 5 authorizes with here
+    warnings.filterwarnings('ignore', category=DeprecationWarning)
+
     scope = ['https://spreadsheets.google.com/feeds',
              'https://www.googleapis.com/auth/drive']
 
@@ -104,16 +557,8 @@ def get_sheets_client():
     return client
 
 
-def write_to_sheets(data, sheet_id, worksheet_name=None, clear_first=True):
-    """Write extracted data to Google Sheets
-
-    Args:
-        data: Dict with 'headers' and 'rows' keys
-        sheet_id: Google Sheets ID
-        worksheet_name: Name of the worksheet/tab (e.g., "Sheet1", "Treatment Data").
-                       If None, uses the first sheet.
-        clear_first: If True, clears existing data before writing
-    """
+def open_worksheet(sheet_id, worksheet_name=None):
+    """Open a worksheet by name, or the first sheet if no name is given"""
     print("Connecting to Google Sheets...")
 
     client = get_sheets_client()
@@ -123,14 +568,34 @@ def write_to_sheets(data, sheet_id, worksheet_name=None, clear_first=True):
     if worksheet_name:
         print(f"Opening worksheet: {worksheet_name}")
         try:
-            sheet = spreadsheet.worksheet(worksheet_name)
+            return spreadsheet.worksheet(worksheet_name)
         except Exception as e:
             print(f"Worksheet '{worksheet_name}' not found. Available worksheets:")
             for ws in spreadsheet.worksheets():
                 print(f"  - {ws.title}")
             raise Exception(f"Worksheet '{worksheet_name}' does not exist") from e
-    else:
-        sheet = spreadsheet.sheet1
+
+    return spreadsheet.sheet1
+
+
+def write_to_sheets(data, sheet_id, worksheet_name=None, clear_first=True, sheet=None):
+    """Write extracted data to Google Sheets
+
+    Args:
+        data: Dict with 'headers' and 'rows' keys
+        sheet_id: Google Sheets ID
+        worksheet_name: Name of the worksheet/tab (e.g., "Sheet1", "Treatment Data").
+                       If None, uses the first sheet.
+        clear_first: If True, clears existing data before writing
+        sheet: Worksheet already opened with open_worksheet(sheet_id, worksheet_name),
+               e.g. in the background while the export downloaded
+
+    Returns:
+        (sheet, timestamp): pass both to append_rows_to_sheets so appended rows share
+        this export's Export Timestamp
+    """
+    if sheet is None:
+        sheet = open_worksheet(sheet_id, worksheet_name)
 
     if clear_first:
         print("Clearing existing sheet data...")
@@ -141,25 +606,50 @@ def write_to_sheets(data, sheet_id, worksheet_name=None, clear_first=True):
     if "Export Timestamp" not in headers:
         headers.append("Export Timestamp")
 
-    # Prepare all rows with timestamp
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    rows_with_timestamp = []
+    rows = data["rows"]
 
-    for row in data["rows"]:
-        row_with_timestamp = row + [timestamp]
-        rows_with_timestamp.append(row_with_timestamp)
-
-    # Write in chunks to avoid Google Sheets API 502 errors on large payloads
+    # Write in chunks to avoid Google Sheets API 502 errors on large payloads.
+    # Each chunk is a single values.update call over an explicit range, never per-row writes.
+    # Rows get their timestamp as their chunk is built, so only one chunk is copied at a time.
     CHUNK_SIZE = 5000
-    all_data = [headers] + rows_with_timestamp
-    print(f"Writing headers and {len(rows_with_timestamp)} rows in chunks of {CHUNK_SIZE}...")
+    all_data = [headers] + rows
+    num_cols = max(len(headers), max((len(row) + 1 for row in rows), default=0))
+    print(f"Writing headers and {len(rows)} rows in chunks of {CHUNK_SIZE}...")
 
     for i in range(0, len(all_data), CHUNK_SIZE):
-        chunk = all_data[i:i + CHUNK_SIZE]
+        chunk = [[*row, timestamp] for row in all_data[i:i + CHUNK_SIZE]]
+        if i == 0:
+            chunk[0] = headers
         start_row = i + 1
-        sheet.update(f'A{start_row}', chunk)
+        end_cell = gspread.utils.rowcol_to_a1(start_row + len(chunk) - 1, num_cols)
+        sheet.update(f'A{start_row}:{end_cell}', chunk, value_input_option='RAW')
 
     print(f"Successfully wrote {len(data['rows'])} rows to worksheet '{sheet.title}'!")
+    return sheet, timestamp
+
+
+def append_rows_to_sheets(rows, sheet, timestamp):
+    """Append rows below the existing data, adding the Export Timestamp column
+
+    Meant for streaming an export into a sheet started by write_to_sheets, so only
+    one batch of rows has to be held in memory at a time.
+
+    Args:
+        rows: List of row lists (no headers)
+        sheet: Worksheet returned by write_to_sheets
+        timestamp: Export Timestamp returned by write_to_sheets, so every row of one
+                   export carries the same value
+    """
+    rows_with_timestamp = [[*row, timestamp] for row in rows]
+
+    # Same chunking as write_to_sheets; one values.append call per chunk
+    CHUNK_SIZE = 5000
+    for i in range(0, len(rows_with_timestamp), CHUNK_SIZE):
+        sheet.append_rows(rows_with_timestamp[i:i + CHUNK_SIZE],
+                          value_input_option='RAW', insert_data_option='INSERT_ROWS')
+
+    print(f"Appended {len(rows)} rows to worksheet '{sheet.title}'")
 
 
 def wait_for_csv_download(download_dir="/tmp", max_wait=30):
@@ -175,30 +665,65 @@ def wait_for_csv_download(download_dir="/tmp", max_wait=30):
     import time
 
     print("Waiting for CSV file to download...")
-    downloaded_file = None
-
-    for _ in range(max_wait):
-        time.sleep(1)
-        csv_files = [f for f in os.listdir(download_dir) if f.endswith('.csv')]
-        if csv_files:
-            csv_files_with_path = [os.path.join(download_dir, f) for f in csv_files]
-            downloaded_file = max(csv_files_with_path, key=os.path.getmtime)
+    deadline = time.monotonic() + max_wait
+
+    while time.monotonic() < deadline:
+        csv_entries = []
+        in_progress = False
+        with os.scandir(download_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.csv'):
+                    csv_entries.append(entry)
+                elif entry.name.endswith('.crdownload'):
+                    # Chrome renames the file to .csv only once it's complete; no need to look further
+                    in_progress = True
+                    break
+
+        if csv_entries and not in_progress:
+            downloaded_file = max(csv_entries, key=lambda e: e.stat().st_mtime).path
             print(f"Found downloaded CSV file: {os.path.basename(downloaded_file)}")
             return downloaded_file
 
+        time.sleep(0.1)
+
     raise Exception("CSV download timed out")
 
 
 def read_csv_file(file_path):
     """Read CSV file and return data in the expected format"""
     import csv
+    import pandas as pd
 
     print(f"Reading CSV file: {file_path}")
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            csv_reader = csv.reader(f)
-            all_rows = list(csv_reader)
+        try:
+            # Everything stays a string exactly as exported (no NaN/number coercion)
+            options = dict(header=None, dtype=str, keep_default_na=False, encoding='utf-8')
+            try:
+                import pyarrow
+            except ImportError:
+                pyarrow = None
+            if pyarrow is None:
+                frame = pd.read_csv(file_path, **options)
+            else:
+                try:
+                    # Multithreaded Arrow parser when pyarrow is installed
+                    frame = pd.read_csv(file_path, engine='pyarrow', **options)
+                except pd.errors.ParserError as e:
+                    # pandas re-raises pyarrow's ArrowInvalid as ParserError; Arrow can't read
+                    # quoted cells with line breaks (e.g. free-text notes), the default parser can
+                    if not isinstance(e.__cause__, pyarrow.ArrowInvalid):
+                        raise
+                    print(f"pyarrow could not parse the CSV ({e}), re-reading with the default parser")
+                    frame = pd.read_csv(file_path, **options)
+            all_rows = frame.values.tolist()
+        except pd.errors.EmptyDataError:
+            all_rows = []
+        except pd.errors.ParserError:
+            # Ragged rows (more fields than the header) - fall back to the stdlib reader
+            with open(file_path, 'r', encoding='utf-8') as f:
+                all_rows = list(csv.reader(f))
 
         if not all_rows:
             print("CSV file is empty")
@@ -220,9 +745,37 @@ def read_csv_file(file_path):
         return {"headers": [], "rows": []}
 
 
+def iter_csv_chunks(file_path, chunk_size=5000):
+    """Read a CSV lazily, yielding (headers, rows) one batch of rows at a time
+
+    For streaming a large export into a sheet (write_to_sheets for the first
+    batch, append_rows_to_sheets for the rest) without holding every row at once.
+    The file is only open while the generator runs, and closes when it finishes
+    or is closed.
+
+    Args:
+        file_path: CSV file to read
+        chunk_size: Rows per yielded batch
+
+    Yields:
+        (headers, rows) where rows is a list of up to chunk_size rows
+    """
+    import csv
+    from itertools import islice
+
+    print(f"Reading CSV file in chunks of {chunk_size}: {file_path}")
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        while rows := list(islice(reader, chunk_size)):
+            yield headers, rows
+
+
 def clear_old_csv_files(download_dir="/tmp"):
-    """Clear any existing CSV files in download directory"""
-    for file in os.listdir(download_dir):
-        if file.endswith('.csv'):
-            os.remove(os.path.join(download_dir, file))
-            print(f"Removed old CSV file: {file}")
+    """Clear any existing CSV files (and unfinished Chrome downloads) in download directory"""
+    with os.scandir(download_dir) as entries:
+        for entry in entries:
+            # A partial left by an interrupted run would make wait_for_csv_download wait it out
+            if entry.name.endswith(('.csv', '.crdownload')):
+                os.remove(entry.path)
+                print(f"Removed old download: {entry.name}")